@@ -11,11 +11,124 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
 
+# ---- Password Hashing / Login Throttling ----
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+# Failed logins / registrations per client IP
+LOGIN_IP_BURST = int(os.getenv("LOGIN_IP_BURST", 20))
+LOGIN_IP_PER_MINUTE = float(os.getenv("LOGIN_IP_PER_MINUTE", 30))
+# Failed logins per (account, client IP): only the offending client is blocked
+LOGIN_ACCOUNT_BURST = int(os.getenv("LOGIN_ACCOUNT_BURST", 5))
+LOGIN_ACCOUNT_PER_MINUTE = float(os.getenv("LOGIN_ACCOUNT_PER_MINUTE", 5))
+# Failed logins per account from anywhere: slows attempts down, never rejects
+LOGIN_SLOWDOWN_BURST = int(os.getenv("LOGIN_SLOWDOWN_BURST", 20))
+LOGIN_SLOWDOWN_PER_MINUTE = float(os.getenv("LOGIN_SLOWDOWN_PER_MINUTE", 20))
+LOGIN_SLOWDOWN_MAX_SECONDS = float(os.getenv("LOGIN_SLOWDOWN_MAX_SECONDS", 2.0))
+# Reverse proxies / load balancers (IPs or CIDRs) whose X-Forwarded-For is trusted
+TRUSTED_PROXIES = [p.strip() for p in os.getenv("TRUSTED_PROXIES", "").split(",") if p.strip()]
+
+# ---- Auth Caching ----
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10_000))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", 300))
+# Carry the user id in the JWT so most requests skip the user lookup
+TOKEN_EMBED_USER_ID = os.getenv("TOKEN_EMBED_USER_ID", "true").lower() in ("1", "true", "yes")
+
 # ---- Cloudinary ----
 CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
 CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
 CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
 
+# ---- Gemini Client ----
+GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", 60))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 2))
+GEMINI_BACKOFF_BASE_SECONDS = float(os.getenv("GEMINI_BACKOFF_BASE_SECONDS", 0.5))
+GEMINI_BACKOFF_MAX_SECONDS = float(os.getenv("GEMINI_BACKOFF_MAX_SECONDS", 8))
+GEMINI_HEDGE_ENABLED = os.getenv("GEMINI_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes")
+# Used until enough calls are seen to hedge at the observed p95 latency
+GEMINI_HEDGE_AFTER_SECONDS = float(os.getenv("GEMINI_HEDGE_AFTER_SECONDS", 15))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", 8))
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", 5))
+GEMINI_BREAKER_COOLDOWN_SECONDS = float(os.getenv("GEMINI_BREAKER_COOLDOWN_SECONDS", 30))
+
+# ---- Concurrency ----
+BLOCKING_IO_WORKERS = int(os.getenv("BLOCKING_IO_WORKERS", 16))
+# Slow upstream calls (Gemini, Cloudinary) get their own pool so a brownout
+# can't starve the short Mongo calls; room for every Gemini slot plus an upload
+UPSTREAM_IO_WORKERS = int(os.getenv("UPSTREAM_IO_WORKERS", GEMINI_MAX_CONCURRENCY * 2))
+
+# ---- Uploads ----
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))
+# Multipart boundaries, headers and small form fields on top of the image
+REQUEST_FORM_OVERHEAD_BYTES = int(os.getenv("REQUEST_FORM_OVERHEAD_BYTES", 64 * 1024))
+MAX_REQUEST_BYTES = int(
+    os.getenv("MAX_REQUEST_BYTES", MAX_UPLOAD_BYTES + REQUEST_FORM_OVERHEAD_BYTES)
+)
+
+# ---- Image Preprocessing ----
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", 1280))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+
+# ---- Batch Analysis ----
+BATCH_MAX_IMAGES = int(os.getenv("BATCH_MAX_IMAGES", 10))
+BATCH_PACK_SIZE = int(os.getenv("BATCH_PACK_SIZE", 3))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 4))
+MAX_BATCH_REQUEST_BYTES = int(os.getenv(
+    "MAX_BATCH_REQUEST_BYTES",
+    BATCH_MAX_IMAGES * (MAX_UPLOAD_BYTES + REQUEST_FORM_OVERHEAD_BYTES),
+))
+
+# ---- Async Analysis Jobs ----
+JOB_WORKER_PROCESSES = int(os.getenv("JOB_WORKER_PROCESSES", 2))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+# Renewed every third of its length; must outlast one worst-case analysis
+# (checked when the workers start)
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_WAIT_MAX_SECONDS = int(os.getenv("JOB_WAIT_MAX_SECONDS", 30))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", 24 * 3600))
+
+# ---- Nutrition Knowledge Base ----
+NUTRITION_KB_PATH = os.getenv("NUTRITION_KB_PATH")  # defaults to the bundled table
+# Trigram similarity for misspelled names (same word count only)
+NUTRITION_KB_MATCH_THRESHOLD = float(os.getenv("NUTRITION_KB_MATCH_THRESHOLD", 0.65))
+
+# ---- Analysis Cache ----
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", 1024))
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", 6 * 3600))
+ANALYSIS_CACHE_DB_TTL_SECONDS = int(os.getenv("ANALYSIS_CACHE_DB_TTL_SECONDS", 30 * 24 * 3600))
+
+# ---- Community Pagination ----
+# Filtered post counts (search, profile) are cached rather than recomputed per page
+POST_COUNT_CACHE_SIZE = int(os.getenv("POST_COUNT_CACHE_SIZE", 1024))
+POST_COUNT_CACHE_TTL_SECONDS = int(os.getenv("POST_COUNT_CACHE_TTL_SECONDS", 60))
+
+# ---- Feed Cache ----
+# Global feed pages (page <= FEED_CACHE_PAGES) and search/cursor pages, per process
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", 256))
+FEED_CACHE_TTL_SECONDS = int(os.getenv("FEED_CACHE_TTL_SECONDS", 30))
+FEED_CACHE_PAGES = int(os.getenv("FEED_CACHE_PAGES", 5))
+
+# ---- History Export ----
+# Mongo cursor batch size; bounds memory per export regardless of history length
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+
+# ---- Near-duplicate Lookup ----
+# Max Hamming distance (out of 64 bits) for reusing a prior meal analysis
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", 6))
+PHASH_REFRESH_SECONDS = int(os.getenv("PHASH_REFRESH_SECONDS", 60))
+
+# ---- Mongo Connection Pool ----
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 5))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 60_000))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5_000))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5_000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5_000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30_000))
+
+# ---- Mongo Indexes ----
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes")
+MONGO_VERIFY_QUERY_PLANS = os.getenv("MONGO_VERIFY_QUERY_PLANS", "true").lower() in ("1", "true", "yes")
+
 # ---- Safety Check ----
 required_envs = [
     GOOGLE_API_KEY,
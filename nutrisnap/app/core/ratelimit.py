@@ -0,0 +1,107 @@
+import ipaddress
+import logging
+import threading
+import time
+from typing import Iterable, List
+
+from cachetools import TTLCache
+from starlette.requests import Request
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """
+    In-memory token buckets per key (IP, account, ...).
+    Each key holds up to `burst` tokens, refilled at `per_minute` tokens/min.
+    """
+
+    def __init__(self, burst: int, per_minute: float, max_keys: int = 100_000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        # Idle buckets refill completely, so they can simply expire
+        self._buckets = TTLCache(
+            maxsize=max_keys, ttl=max(burst / self.rate, 1.0) if self.rate else 3600
+        )
+        self._lock = threading.Lock()
+
+    def _refill(self, key: str, now: float) -> float:
+        tokens, last = self._buckets.get(key, (float(self.burst), now))
+        return min(self.burst, tokens + (now - last) * self.rate)
+
+    def _wait(self, tokens: float) -> float:
+        return (1 - tokens) / self.rate if self.rate else 60.0
+
+    def check(self, key: str) -> float:
+        """
+        Like acquire() but without taking a token.
+        """
+        with self._lock:
+            tokens = self._refill(key, time.monotonic())
+        return 0.0 if tokens >= 1 else self._wait(tokens)
+
+    def acquire(self, key: str) -> float:
+        """
+        Take one token. Returns 0 when allowed, else seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens = self._refill(key, now)
+
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            return self._wait(tokens)
+
+
+class ClientIP:
+    """
+    Resolve the real client address. X-Forwarded-For is only honoured when the
+    direct peer is a trusted proxy; the address is then the right-most hop that
+    isn't one of our proxies (left-most entries are client-controlled).
+    """
+
+    def __init__(self, trusted_proxies: Iterable[str]):
+        self.networks: List = [ipaddress.ip_network(p, strict=False) for p in trusted_proxies]
+        self._warned = False
+
+    def _trusted(self, address: str) -> bool:
+        try:
+            ip = ipaddress.ip_address(address)
+        except ValueError:
+            return False
+        return any(ip in network for network in self.networks)
+
+    def __call__(self, request: Request) -> str:
+        peer = request.client.host if request.client else "unknown"
+        if not self._trusted(peer):
+            return peer
+
+        forwarded = request.headers.get("x-forwarded-for", "")
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        for hop in reversed(hops):
+            if not self._trusted(hop):
+                return hop
+        return hops[0] if hops else peer
+
+    def behind_unknown_proxy(self, request: Request) -> bool:
+        """
+        True when the request was forwarded by a peer we don't trust: the
+        resolved address is then (probably) a load balancer shared by many
+        users, so it can't single out one client.
+        """
+        peer = request.client.host if request.client else "unknown"
+        if "x-forwarded-for" not in request.headers or self._trusted(peer):
+            return False
+
+        if not self._warned:
+            self._warned = True
+            logger.error(
+                "Request from %s carries X-Forwarded-For but the peer is not in "
+                "TRUSTED_PROXIES: every client behind it shares one rate-limit "
+                "address. Set TRUSTED_PROXIES to the load balancer addresses.",
+                peer,
+            )
+        return True
@@ -1,11 +1,25 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from bson import ObjectId
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 
-from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
-from app.db.mongo import users_collection
+from app.core.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    TOKEN_CACHE_SIZE,
+    TOKEN_CACHE_TTL_SECONDS,
+    TOKEN_EMBED_USER_ID,
+    PASSWORD_HASH_WORKERS,
+)
+from app.db.users import find_user_by_email
 
 # ---- Password hashing ----
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -13,13 +27,38 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 # ---- OAuth2 ----
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# bcrypt releases the GIL, so a small dedicated pool hashes in parallel
+# without stealing threads from the general I/O executor
+password_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="bcrypt",
+)
+
+def _truncate(password: str) -> str:
+    return password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
+
 def get_password_hash(password: str) -> str:
-    password = password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
-    return pwd_context.hash(password)
+    return pwd_context.hash(_truncate(password))
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    plain_password = plain_password.encode("utf-8")[:72].decode("utf-8", errors="ignore")
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context.verify(_truncate(plain_password), hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+async def verify_and_update_async(plain_password: str, hashed_password: str):
+    """
+    Verify off the event loop. Returns (valid, new_hash); new_hash is set when the
+    stored hash uses outdated CryptContext settings and should be replaced.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_executor,
+        pwd_context.verify_and_update,
+        _truncate(plain_password),
+        hashed_password,
+    )
 
 # ---- JWT ----
 def create_access_token(data: dict) -> str:
@@ -28,21 +67,69 @@ def create_access_token(data: dict) -> str:
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+def create_user_token(user: dict) -> str:
+    claims = {"sub": user["email"]}
+    if TOKEN_EMBED_USER_ID:
+        claims["uid"] = str(user["_id"])
+    return create_access_token(claims)
+
+# ---- Principal caches ----
+# token -> (principal, exp) and email -> principal; principals are {"_id", "email"}
+_token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+_user_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+
+def invalidate_user(email: str) -> None:
+    """
+    Drop cached principals for a user (call after any change to the user document).
+    """
+    with _cache_lock:
+        _user_cache.pop(email, None)
+        stale = [t for t, (p, _) in _token_cache.items() if p["email"] == email]
+        for token in stale:
+            _token_cache.pop(token, None)
+
+async def _load_principal(email: str) -> dict:
+    with _cache_lock:
+        principal = _user_cache.get(email)
+    if principal is not None:
+        return principal
+
+    user = await find_user_by_email(email, {"_id": 1, "email": 1})
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+
+    principal = {"_id": user["_id"], "email": user["email"]}
+    with _cache_lock:
+        _user_cache[email] = principal
+    return principal
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> dict:
+    with _cache_lock:
+        cached = _token_cache.get(token)
+    if cached is not None and cached[1] > time.time():
+        return cached[0]
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email = payload.get("sub")
         if not email:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        user = users_collection.find_one({"email": email})
-        if not user:
-            raise HTTPException(status_code=401, detail="User not found")
-
-        return user
+        uid = payload.get("uid")
+        if TOKEN_EMBED_USER_ID and uid and ObjectId.is_valid(uid):
+            # User id travels in the token: no user fetch needed
+            principal = {"_id": ObjectId(uid), "email": email}
+        else:
+            principal = await _load_principal(email)
 
     except JWTError:
         raise HTTPException(
             status_code=401,
             detail="Token expired or invalid. Please login again."
         )
+
+    with _cache_lock:
+        _token_cache[token] = (principal, payload["exp"])
+
+    return principal
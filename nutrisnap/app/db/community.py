@@ -0,0 +1,328 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from bson import ObjectId
+from cachetools import TTLCache
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core.config import POST_COUNT_CACHE_SIZE, POST_COUNT_CACHE_TTL_SECONDS
+from app.db.mongo import (
+    posts_collection,
+    likes_collection,
+    comments_collection,
+    async_posts_collection,
+    async_likes_collection,
+    async_comments_collection,
+)
+from app.db.stats import inc_user_stats
+
+
+# ---- Posts ----
+async def insert_post(post: dict):
+    result = await async_posts_collection.insert_one(post)
+    await inc_user_stats(post["author_id"], posts_count=1)
+    return result
+
+
+POST_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def _after(cursor: tuple, descending: bool) -> dict:
+    """
+    Keyset filter for documents past a decoded (created_at, _id) cursor.
+
+    created_at may still be a legacy ISO string on rows migrate-storage hasn't
+    reached. $lt/$gt only match values of the same BSON type, and strings sort
+    before dates, so the other type's block is added explicitly when it comes
+    next in the sort order.
+    """
+    created_at, doc_id = cursor
+    op = "$lt" if descending else "$gt"
+    clauses = [
+        {"created_at": {op: created_at}},
+        {"created_at": created_at, "_id": {op: doc_id}},
+    ]
+    if descending and isinstance(created_at, datetime):
+        clauses.append({"created_at": {"$type": "string"}})
+    elif not descending and isinstance(created_at, str):
+        clauses.append({"created_at": {"$type": "date"}})
+    return {"$or": clauses}
+
+# Fields a post card renders (author_email stays private)
+POST_PROJECTION = {
+    "author_id": 1,
+    "image_url": 1,
+    "caption": 1,
+    "nutrition": 1,
+    "likes_count": 1,
+    "comments_count": 1,
+    "created_at": 1,
+}
+
+_count_cache = TTLCache(maxsize=POST_COUNT_CACHE_SIZE, ttl=POST_COUNT_CACHE_TTL_SECONDS)
+
+
+async def list_posts(
+    query: dict,
+    limit: int,
+    skip: int = 0,
+    after: Optional[tuple] = None,
+) -> List[dict]:
+    """
+    Newest-first posts. `after` is a decoded (created_at, _id) cursor; when set
+    the page is located by the index (keyset) instead of skipping documents.
+    Posts without a created_at (until migrate-storage backfills them) can't
+    carry a cursor and are left out.
+    """
+    query = {"$and": [query, {"created_at": {"$type": ["date", "string"]}}]}
+    if after:
+        query["$and"].append(_after(after, descending=True))
+
+    cursor = async_posts_collection.find(query, POST_PROJECTION).sort(POST_SORT).limit(limit)
+    if skip:
+        cursor = cursor.skip(skip)
+    return await cursor.to_list(length=limit)
+
+
+async def delete_post(post_id: str, author_id: str) -> Optional[dict]:
+    if not ObjectId.is_valid(post_id):
+        return None
+
+    post = await async_posts_collection.find_one_and_delete(
+        {"_id": ObjectId(post_id), "author_id": author_id}
+    )
+    if post:
+        await asyncio.gather(
+            async_likes_collection.delete_many({"post_id": post_id}),
+            async_comments_collection.delete_many({"post_id": post_id}),
+            inc_user_stats(
+                author_id,
+                posts_count=-1,
+                likes_received=-post.get("likes_count", 0),
+            ),
+        )
+    return post
+
+
+async def count_posts(query: dict) -> int:
+    return await async_posts_collection.count_documents(query)
+
+
+async def approximate_post_count(query: dict) -> int:
+    """
+    Metadata count for the unfiltered feed, short-lived cached count otherwise.
+    """
+    if not query:
+        return await async_posts_collection.estimated_document_count()
+
+    key = repr(sorted(query.items()))
+    total = _count_cache.get(key)
+    if total is None:
+        total = await count_posts(query)
+        _count_cache[key] = total
+    return total
+
+
+async def inc_post_likes(post_id: ObjectId, delta: int) -> Optional[int]:
+    """
+    Atomically adjust a post's like counter (and its author's likes_received);
+    returns the new count, or None if the post doesn't exist.
+    """
+    post = await async_posts_collection.find_one_and_update(
+        {"_id": post_id},
+        {"$inc": {"likes_count": delta}},
+        projection={"likes_count": 1, "author_id": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not post:
+        return None
+
+    await inc_user_stats(post["author_id"], likes_received=delta)
+    return post["likes_count"]
+
+
+# ---- Likes ----
+# Likes store post_id as the post's hex string; (post_id, user_id) is unique, so
+# inserting is the "like" and a DuplicateKeyError means it already existed.
+async def add_like(post_id: ObjectId, user_id: str) -> Tuple[bool, Optional[int]]:
+    """
+    Idempotent like. Returns (changed, likes_count); likes_count is None when
+    the post doesn't exist.
+    """
+    try:
+        await async_likes_collection.insert_one({
+            "post_id": str(post_id),
+            "user_id": user_id,
+            "created_at": datetime.utcnow(),
+        })
+    except DuplicateKeyError:
+        post = await async_posts_collection.find_one({"_id": post_id}, {"likes_count": 1})
+        return False, post.get("likes_count", 0) if post else None
+
+    likes_count = await inc_post_likes(post_id, 1)
+    if likes_count is None:
+        await async_likes_collection.delete_one({"post_id": str(post_id), "user_id": user_id})
+    return True, likes_count
+
+
+async def remove_like(post_id: ObjectId, user_id: str) -> Tuple[bool, Optional[int]]:
+    """
+    Idempotent unlike, mirroring add_like.
+    """
+    result = await async_likes_collection.delete_one({"post_id": str(post_id), "user_id": user_id})
+    if not result.deleted_count:
+        post = await async_posts_collection.find_one({"_id": post_id}, {"likes_count": 1})
+        return False, post.get("likes_count", 0) if post else None
+
+    return True, await inc_post_likes(post_id, -1)
+
+
+async def liked_post_ids(user_id: str, post_ids: List[str]) -> List[str]:
+    """
+    Which of `post_ids` the user has liked, in one query.
+    """
+    cursor = async_likes_collection.find(
+        {"user_id": user_id, "post_id": {"$in": post_ids}},
+        {"_id": 0, "post_id": 1},
+    )
+    return [like["post_id"] async for like in cursor]
+
+
+def _reconcile_post_counter(source, field: str) -> int:
+    """
+    Recompute posts.<field> by counting `source` documents per post_id and fix
+    the posts that drifted. Returns the number of posts corrected.
+    """
+    counts = {
+        row["_id"]: row["count"]
+        for row in source.aggregate(
+            [{"$group": {"_id": "$post_id", "count": {"$sum": 1}}}]
+        )
+    }
+
+    fixes, corrected = [], 0
+    for post in posts_collection.find({}, {field: 1}):
+        actual = counts.get(str(post["_id"]), 0)
+        if post.get(field) != actual:
+            fixes.append(UpdateOne({"_id": post["_id"]}, {"$set": {field: actual}}))
+
+        if len(fixes) >= 1000:
+            posts_collection.bulk_write(fixes, ordered=False)
+            corrected += len(fixes)
+            fixes = []
+
+    if fixes:
+        posts_collection.bulk_write(fixes, ordered=False)
+        corrected += len(fixes)
+    return corrected
+
+
+def dedupe_likes() -> int:
+    """
+    Delete duplicate (post_id, user_id) likes, keeping the oldest, so the
+    unique index can be built. Returns the number of likes removed.
+    """
+    duplicates = likes_collection.aggregate(
+        [
+            {"$sort": {"_id": 1}},
+            {
+                "$group": {
+                    "_id": {"post_id": "$post_id", "user_id": "$user_id"},
+                    "ids": {"$push": "$_id"},
+                    "count": {"$sum": 1},
+                }
+            },
+            {"$match": {"count": {"$gt": 1}}},
+        ],
+        allowDiskUse=True,
+    )
+
+    removed, extra = 0, []
+    for group in duplicates:
+        extra.extend(group["ids"][1:])
+        if len(extra) >= 1000:
+            removed += likes_collection.delete_many({"_id": {"$in": extra}}).deleted_count
+            extra = []
+
+    if extra:
+        removed += likes_collection.delete_many({"_id": {"$in": extra}}).deleted_count
+    return removed
+
+
+def reconcile_like_counts() -> int:
+    return _reconcile_post_counter(likes_collection, "likes_count")
+
+
+def reconcile_comment_counts() -> int:
+    return _reconcile_post_counter(comments_collection, "comments_count")
+
+
+# ---- Comments ----
+COMMENT_SORT = [("created_at", 1), ("_id", 1)]
+COMMENT_PROJECTION = {"user_id": 1, "text": 1, "created_at": 1}
+
+
+async def insert_comment(post_id: ObjectId, comment: dict) -> Optional[int]:
+    """
+    Add a comment and bump the post's comments_count. Returns the new count,
+    or None (nothing kept) if the post doesn't exist. Like add_like, the
+    comment is written first, so a failed insert never inflates the counter.
+    """
+    result = await async_comments_collection.insert_one({**comment, "post_id": str(post_id)})
+
+    post = await async_posts_collection.find_one_and_update(
+        {"_id": post_id},
+        {"$inc": {"comments_count": 1}},
+        projection={"comments_count": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if not post:
+        await async_comments_collection.delete_one({"_id": result.inserted_id})
+        return None
+    return post["comments_count"]
+
+
+async def list_comments(post_id: str, limit: int, after: Optional[tuple] = None) -> List[dict]:
+    """
+    Oldest-first comments of a post; `after` is a decoded (created_at, _id) cursor.
+    """
+    query = {"post_id": post_id}
+    if after:
+        query.update(_after(after, descending=False))
+
+    cursor = (
+        async_comments_collection.find(query, COMMENT_PROJECTION)
+        .sort(COMMENT_SORT)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
+
+
+async def first_comments(post_ids: List[str], k: int) -> dict:
+    """
+    The first k comments of each post in one aggregation: {post_id: [comments]}.
+    $topN keeps only k per group, so memory doesn't grow with thread length.
+    """
+    cursor = await async_comments_collection.aggregate([
+        {"$match": {"post_id": {"$in": post_ids}}},
+        {
+            "$group": {
+                "_id": "$post_id",
+                "comments": {
+                    "$topN": {
+                        "n": k,
+                        "sortBy": {"created_at": 1, "_id": 1},
+                        "output": {
+                            "_id": "$_id",
+                            "user_id": "$user_id",
+                            "text": "$text",
+                            "created_at": "$created_at",
+                        },
+                    }
+                },
+            }
+        },
+    ])
+    return {row["_id"]: row["comments"] async for row in cursor}
@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+
+from app.db.mongo import async_goals_collection
+
+
+async def get_goals(user_id: str) -> Optional[dict]:
+    return await async_goals_collection.find_one({"user_id": user_id}, {"_id": 0})
+
+
+async def upsert_goals(user_id: str, goals: dict, now: datetime) -> None:
+    await async_goals_collection.update_one(
+        {"user_id": user_id},
+        {
+            "$set": {**goals, "updated_at": now},
+            "$setOnInsert": {
+                "created_at": now,
+                "user_id": user_id,
+            },
+        },
+        upsert=True,
+    )
@@ -0,0 +1,158 @@
+import logging
+from typing import Iterable, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from app.core.config import ANALYSIS_CACHE_DB_TTL_SECONDS, JOB_RETENTION_SECONDS
+from app.db.mongo import (
+    users_collection,
+    meals_collection,
+    goals_collection,
+    posts_collection,
+    likes_collection,
+    comments_collection,
+    analysis_cache_collection,
+    jobs_collection,
+    rollups_collection,
+)
+
+logger = logging.getLogger("nutrisnap.indexes")
+
+# ---- Required indexes per collection ----
+INDEXES = {
+    users_collection: [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    meals_collection: [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="user_timestamp"),
+        IndexModel([("indexed_at", ASCENDING)], name="indexed_at"),
+    ],
+    goals_collection: [
+        IndexModel([("user_id", ASCENDING)], name="user_unique", unique=True),
+    ],
+    posts_collection: [
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="author_created_at_id",
+        ),
+        IndexModel([("caption", TEXT)], name="caption_text"),
+    ],
+    likes_collection: [
+        IndexModel([("post_id", ASCENDING), ("user_id", ASCENDING)], name="post_user_unique", unique=True),
+    ],
+    comments_collection: [
+        IndexModel(
+            [("post_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+            name="post_created_at_id",
+        ),
+    ],
+    analysis_cache_collection: [
+        IndexModel(
+            [("created_at", ASCENDING)],
+            name="created_at_ttl",
+            expireAfterSeconds=ANALYSIS_CACHE_DB_TTL_SECONDS,
+        ),
+    ],
+    rollups_collection: [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], name="user_date"),
+    ],
+    jobs_collection: [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created_at"),
+        IndexModel(
+            [("updated_at", ASCENDING)],
+            name="finished_ttl",
+            expireAfterSeconds=JOB_RETENTION_SECONDS,
+            partialFilterExpression={"status": {"$in": ["done", "failed"]}},
+        ),
+    ],
+}
+
+# ---- Query shapes used by the routes: (name, collection, filter, sort) ----
+QUERY_SHAPES = [
+    ("login / get_current_user", users_collection, {"email": "x"}, None),
+    ("/history", meals_collection, {"user_id": "x"}, [("timestamp", -1)]),
+    ("/goals", goals_collection, {"user_id": "x"}, None),
+    ("/community/feed", posts_collection, {}, [("created_at", -1), ("_id", -1)]),
+    ("/community/feed?search", posts_collection, {"$text": {"$search": "x"}}, None),
+    ("/profile/{user_id}/posts", posts_collection, {"author_id": "x"}, [("created_at", -1), ("_id", -1)]),
+    ("/community/like", likes_collection, {"post_id": "x", "user_id": "y"}, None),
+    ("/community/comments", comments_collection, {"post_id": "x"}, [("created_at", 1), ("_id", 1)]),
+    ("job claim", jobs_collection, {"status": "queued"}, [("created_at", 1)]),
+]
+
+
+class IndexBuildError(RuntimeError):
+    """
+    A unique index could not be built, so the guarantee it provides is missing.
+    """
+
+
+def ensure_indexes(collections: Optional[Iterable] = None) -> List[str]:
+    """
+    Create every declared index (or those of `collections`). Existing identical
+    indexes are a no-op, so this is safe to run on every startup.
+
+    Returns the names of indexes that could not be built. A failed unique index
+    raises IndexBuildError once the others have been attempted: duplicate data
+    must be cleaned up (e.g. `python -m app.manage reconcile-likes`) first.
+    """
+    failed, failed_unique = [], []
+    for collection, models in INDEXES.items():
+        if collections is not None and collection not in collections:
+            continue
+
+        for model in models:
+            name = f"{collection.name}.{model.document['name']}"
+            try:
+                collection.create_indexes([model])
+            except OperationFailure as exc:
+                # e.g. duplicate data blocking a unique index, or a changed spec
+                logger.error("could not create index %s: %s", name, exc)
+                failed.append(name)
+                if model.document.get("unique"):
+                    failed_unique.append(name)
+
+    if failed_unique:
+        raise IndexBuildError(
+            "Unique index(es) could not be built, likely because of duplicate "
+            "documents: " + ", ".join(failed_unique)
+        )
+    return failed
+
+
+def _stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        found = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            found.extend(_stages(value))
+        return found
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _stages(item)]
+    return []
+
+
+def verify_query_plans() -> List[str]:
+    """
+    explain() each route's query shape and warn about collection scans.
+    Returns the names of the shapes that are not index-backed.
+    """
+    offenders = []
+    for name, collection, query, sort in QUERY_SHAPES:
+        cursor = collection.find(query).limit(1)
+        if sort:
+            cursor = cursor.sort(sort)
+
+        try:
+            plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        except OperationFailure as exc:
+            logger.warning("explain failed for %s: %s", name, exc)
+            offenders.append(name)
+            continue
+
+        if "COLLSCAN" in _stages(plan):
+            logger.warning("%s uses a COLLSCAN on %s", name, collection.name)
+            offenders.append(name)
+
+    return offenders
@@ -0,0 +1,212 @@
+import asyncio
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from bson import ObjectId
+
+from app.db import rollups
+from app.db.stats import inc_meal_counts, inc_user_stats, inc_user_stats_sync
+from app.db.rollups import NUTRIENTS
+from app.db.mongo import (
+    meals_collection,
+    meal_items_collection,
+    async_meals_collection,
+    async_meal_items_collection,
+)
+
+
+# Storage layout: `meals` holds a compact summary (totals, image, timestamp) for
+# list/summary/range queries; the per-item breakdown lives in `meal_items`
+# under the same _id and is only read when a single meal is opened.
+def split_meal(meal: dict) -> Tuple[dict, dict]:
+    """
+    Assign the meal its _id and split out {"_id", "items"} as the detail doc.
+    indexed_at records the store time, which the pHash index refreshes by.
+    """
+    meal.setdefault("_id", ObjectId())
+    meal["indexed_at"] = datetime.utcnow()
+    analysis = dict(meal.get("analysis") or {})
+    items = analysis.pop("items", [])
+    analysis["items_count"] = len(items)
+
+    meal["analysis"] = analysis
+    return meal, {"_id": meal["_id"], "items": items}
+
+
+def join_meal(meal: dict, detail: Optional[dict]) -> dict:
+    if detail is not None:
+        meal["analysis"] = {**meal.get("analysis", {}), "items": detail["items"]}
+    return meal
+
+
+async def insert_meal(meal: dict) -> ObjectId:
+    result = await insert_meals([meal])
+    return result.inserted_ids[0]
+
+
+async def insert_meals(meals: List[dict]):
+    summaries, details = zip(*(split_meal(meal) for meal in meals))
+
+    # Detail first, so a visible meal always has its items
+    await async_meal_items_collection.insert_many(list(details))
+    result = await async_meals_collection.insert_many(list(summaries))
+    await asyncio.gather(rollups.add_meals(meals), inc_meal_counts(meals))
+    return result
+
+
+def insert_meal_sync(meal: dict) -> ObjectId:
+    """
+    Store a meal under its (possibly preassigned) _id. Re-storing the same _id
+    raises DuplicateKeyError before any counters are touched.
+    """
+    meal, detail = split_meal(meal)
+    meal_items_collection.replace_one({"_id": detail["_id"]}, detail, upsert=True)
+    meals_collection.insert_one(meal)
+    rollups.add_meals_sync([meal])
+    inc_user_stats_sync(meal["user_id"], meals_count=1)
+    return meal["_id"]
+
+
+async def get_meal(user_id: str, meal_id: str) -> Optional[dict]:
+    if not ObjectId.is_valid(meal_id):
+        return None
+
+    oid = ObjectId(meal_id)
+    meal, detail = await asyncio.gather(
+        async_meals_collection.find_one({"_id": oid, "user_id": user_id}),
+        async_meal_items_collection.find_one({"_id": oid}),
+    )
+    return join_meal(meal, detail) if meal else None
+
+
+def get_meal_analysis_sync(meal_id: ObjectId) -> Optional[dict]:
+    meal = meals_collection.find_one({"_id": meal_id}, {"analysis": 1})
+    if not meal:
+        return None
+    return join_meal(meal, meal_items_collection.find_one({"_id": meal_id}))["analysis"]
+
+
+async def delete_meal(user_id: str, meal_id: str) -> Optional[dict]:
+    if not ObjectId.is_valid(meal_id):
+        return None
+
+    meal = await async_meals_collection.find_one_and_delete(
+        {"_id": ObjectId(meal_id), "user_id": user_id}
+    )
+    if meal:
+        await asyncio.gather(
+            async_meal_items_collection.delete_one({"_id": meal["_id"]}),
+            inc_user_stats(user_id, meals_count=-1),
+        )
+        if "timestamp" in meal:
+            await rollups.remove_meal(meal)
+    return meal
+
+
+# What the dashboard renders; the full analysis (items etc.) stays in Mongo
+HISTORY_PROJECTION = {
+    "image_url": 1,
+    "timestamp": 1,
+    "analysis.total_nutrition": 1,
+}
+
+
+async def list_recent_meals(user_id: str, limit: int) -> List[dict]:
+    cursor = (
+        async_meals_collection.find({"user_id": user_id}, HISTORY_PROJECTION)
+        .sort("timestamp", -1)
+        .limit(limit)
+    )
+    return await cursor.to_list(length=limit)
+
+
+async def iter_meals(
+    user_id: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    batch_size: int,
+) -> AsyncIterator[dict]:
+    """
+    Oldest-first summary docs in [start, end), fetched batch_size at a time.
+    """
+    query = {"user_id": user_id}
+    if start or end:
+        query["timestamp"] = {}
+        if start:
+            query["timestamp"]["$gte"] = start
+        if end:
+            query["timestamp"]["$lt"] = end
+
+    cursor = (
+        async_meals_collection.find(
+            query,
+            {"timestamp": 1, "image_url": 1, "analysis.total_nutrition": 1, "analysis.items_count": 1},
+        )
+        .sort("timestamp", 1)
+        .batch_size(batch_size)
+    )
+    async for meal in cursor:
+        yield meal
+
+
+async def aggregate_range(
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    bucket: str,
+    timezone: str,
+) -> dict:
+    """
+    Per-bucket nutrient totals plus the list of logged local days, in one round trip.
+
+    Days are cut in `timezone`; weeks start on Monday. Only the timestamp and
+    the numeric total_nutrition fields ever leave the $project stage.
+    """
+    def trunc(unit: str, date_expr) -> dict:
+        spec = {"date": date_expr, "unit": unit, "timezone": timezone}
+        if unit == "week":
+            spec["startOfWeek"] = "monday"
+        return {"$dateTrunc": spec}
+
+    pipeline = [
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lt": end}}},
+        {
+            "$project": {
+                "_id": 0,
+                "timestamp": 1,
+                **{n: f"$analysis.total_nutrition.{n}" for n in NUTRIENTS},
+            }
+        },
+        # Collapse to local days first; buckets and streaks both build on it
+        {
+            "$group": {
+                "_id": trunc("day", "$timestamp"),
+                **{n: {"$sum": f"${n}"} for n in NUTRIENTS},
+                "meals_count": {"$sum": 1},
+            }
+        },
+        {
+            "$facet": {
+                "buckets": [
+                    {
+                        "$group": {
+                            "_id": trunc(bucket, "$_id"),
+                            **{n: {"$sum": f"${n}"} for n in NUTRIENTS},
+                            "meals_count": {"$sum": "$meals_count"},
+                            "days_logged": {"$sum": 1},
+                            "days_calories": {"$push": "$calories"},
+                        }
+                    },
+                    {"$sort": {"_id": 1}},
+                ],
+                "days": [
+                    {"$sort": {"_id": 1}},
+                    {"$project": {"_id": 1}},
+                ],
+            }
+        },
+    ]
+
+    cursor = await async_meals_collection.aggregate(pipeline)
+    result = await cursor.to_list(length=1)
+    return result[0] if result else {"buckets": [], "days": []}
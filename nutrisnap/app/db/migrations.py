@@ -0,0 +1,147 @@
+"""
+Storage format migrations. Each step selects only documents still in the old
+shape and rewrites them in bounded batches, so it's safe to run against a live
+database and to re-run after an interruption.
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from app.db.mongo import (
+    users_collection,
+    meals_collection,
+    meal_items_collection,
+    goals_collection,
+    posts_collection,
+    comments_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_iso(value: str) -> datetime:
+    # Values were written with datetime.utcnow().isoformat(): naive UTC
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _batched(
+    collection,
+    query: dict,
+    projection: dict,
+    batch_size: int,
+    rewrite: Callable,
+    prepare: Optional[Callable[[List[dict]], None]] = None,
+) -> int:
+    """
+    Repeatedly fetch up to batch_size matching documents and apply rewrite(doc)
+    -> UpdateOne. Rewritten documents stop matching `query`, so this terminates.
+    `prepare(docs)` runs first on each batch, for writes to other collections.
+    """
+    total = 0
+    while True:
+        docs = list(collection.find(query, projection).limit(batch_size))
+        if not docs:
+            return total
+
+        if prepare is not None:
+            prepare(docs)
+        collection.bulk_write([rewrite(doc) for doc in docs], ordered=False)
+        total += len(docs)
+        logger.info("%s: migrated %d", collection.name, total)
+
+
+def _string_dates(collection, field: str, batch_size: int) -> int:
+    return _batched(
+        collection,
+        {field: {"$type": "string"}},
+        {field: 1},
+        batch_size,
+        lambda doc: UpdateOne(
+            {"_id": doc["_id"]}, {"$set": {field: _parse_iso(doc[field])}}
+        ),
+    )
+
+
+def _missing_dates(collection, field: str, batch_size: int) -> int:
+    # Documents that never had the field get their ObjectId's creation time
+    return _batched(
+        collection,
+        {field: {"$exists": False}},
+        {"_id": 1},
+        batch_size,
+        lambda doc: UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {field: doc["_id"].generation_time.replace(tzinfo=None)}},
+        ),
+    )
+
+
+def _compact_meals(batch_size: int) -> int:
+    """
+    Move analysis.items into meal_items and give every meal a native timestamp
+    (taken from its ObjectId when it never had one).
+    """
+    def copy_items(meals: List[dict]) -> None:
+        # Detail docs land before the summaries drop their items
+        writes = [
+            UpdateOne(
+                {"_id": meal["_id"]},
+                {"$set": {"items": meal["analysis"]["items"] or []}},
+                upsert=True,
+            )
+            for meal in meals
+            if "items" in (meal.get("analysis") or {})
+        ]
+        if writes:
+            meal_items_collection.bulk_write(writes, ordered=False)
+
+    def rewrite(meal: dict) -> UpdateOne:
+        analysis = meal.get("analysis") or {}
+        update = {"$set": {}, "$unset": {}}
+
+        if "items" in analysis:
+            items = analysis["items"] or []
+            update["$set"]["analysis.items_count"] = len(items)
+            update["$unset"]["analysis.items"] = ""
+
+        timestamp = meal.get("timestamp")
+        if isinstance(timestamp, str):
+            update["$set"]["timestamp"] = _parse_iso(timestamp)
+        elif timestamp is None:
+            update["$set"]["timestamp"] = meal["_id"].generation_time.replace(tzinfo=None)
+
+        return UpdateOne({"_id": meal["_id"]}, {k: v for k, v in update.items() if v})
+
+    return _batched(
+        meals_collection,
+        {
+            "$or": [
+                {"analysis.items": {"$exists": True}},
+                {"timestamp": {"$not": {"$type": "date"}}},
+            ]
+        },
+        {"analysis.items": 1, "timestamp": 1},
+        batch_size,
+        rewrite,
+        prepare=copy_items,
+    )
+
+
+def migrate_storage(batch_size: int = 500) -> Dict[str, int]:
+    """
+    Apply the compact-storage revision. Returns documents rewritten per step.
+    """
+    return {
+        "users.created": _string_dates(users_collection, "created", batch_size),
+        "user_goals.created_at": _string_dates(goals_collection, "created_at", batch_size),
+        "user_goals.updated_at": _string_dates(goals_collection, "updated_at", batch_size),
+        "community_posts.created_at": _string_dates(posts_collection, "created_at", batch_size)
+        + _missing_dates(posts_collection, "created_at", batch_size),
+        "community_comments.created_at": _string_dates(comments_collection, "created_at", batch_size),
+        "meals": _compact_meals(batch_size),
+    }
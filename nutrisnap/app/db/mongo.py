@@ -1,18 +1,56 @@
-from pymongo import MongoClient
-from app.core.config import MONGO_URI
+from pymongo import MongoClient, AsyncMongoClient
+from app.core.config import (
+    MONGO_URI,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_SOCKET_TIMEOUT_MS,
+)
 
 
+# Shared pool settings for both clients
+client_options = {
+    "maxPoolSize": MONGO_MAX_POOL_SIZE,
+    "minPoolSize": MONGO_MIN_POOL_SIZE,
+    "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+    "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+    "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS,
+}
 
-# Create Mongo client
-mongo_client = MongoClient(MONGO_URI)
+# Create Mongo clients: sync for worker threads / processes and maintenance
+# commands, async for request handlers (through the app/db repositories)
+mongo_client = MongoClient(MONGO_URI, **client_options)
+async_mongo_client = AsyncMongoClient(MONGO_URI, **client_options)
 
 # Database
 db = mongo_client["nutrisnap"]
+async_db = async_mongo_client["nutrisnap"]
 
 # Collections
 users_collection = db["users"]
 meals_collection = db["meals"]
+meal_items_collection = db["meal_items"]
 goals_collection = db["user_goals"]
 posts_collection = db["community_posts"]
 likes_collection = db["community_likes"]
 comments_collection = db["community_comments"]
+analysis_cache_collection = db["analysis_cache"]
+jobs_collection = db["analysis_jobs"]
+rollups_collection = db["daily_rollups"]
+user_stats_collection = db["user_stats"]
+
+# Async collections
+async_users_collection = async_db["users"]
+async_meals_collection = async_db["meals"]
+async_meal_items_collection = async_db["meal_items"]
+async_goals_collection = async_db["user_goals"]
+async_posts_collection = async_db["community_posts"]
+async_likes_collection = async_db["community_likes"]
+async_comments_collection = async_db["community_comments"]
+async_rollups_collection = async_db["daily_rollups"]
+async_user_stats_collection = async_db["user_stats"]
@@ -0,0 +1,124 @@
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.db.mongo import (
+    meals_collection,
+    rollups_collection,
+    async_meals_collection,
+    async_rollups_collection,
+)
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+
+
+def rollup_id(user_id: str, day: date) -> str:
+    return f"{user_id}:{day.isoformat()}"
+
+
+def _rollup_update(meal: dict, sign: int) -> UpdateOne:
+    """
+    $inc the meal's totals into its user's daily rollup (sign=-1 to remove it).
+    """
+    day = meal["timestamp"].date()
+    totals = meal["analysis"]["total_nutrition"]
+    inc = {n: sign * totals.get(n, 0) for n in NUTRIENTS}
+    inc["meals_count"] = sign
+
+    return UpdateOne(
+        {"_id": rollup_id(meal["user_id"], day)},
+        {
+            "$inc": inc,
+            "$setOnInsert": {"user_id": meal["user_id"], "date": day.isoformat()},
+        },
+        upsert=True,
+    )
+
+
+async def add_meals(meals: list) -> None:
+    await async_rollups_collection.bulk_write(
+        [_rollup_update(meal, 1) for meal in meals], ordered=False
+    )
+
+
+async def remove_meal(meal: dict) -> None:
+    await async_rollups_collection.bulk_write([_rollup_update(meal, -1)])
+
+
+def add_meals_sync(meals: list) -> None:
+    rollups_collection.bulk_write(
+        [_rollup_update(meal, 1) for meal in meals], ordered=False
+    )
+
+
+async def get_rollup(user_id: str, day: date) -> Optional[dict]:
+    """
+    The day's rollup. Days without one (not backfilled yet) are summed from
+    the meals themselves, a single (user_id, timestamp) index range.
+    """
+    rollup = await async_rollups_collection.find_one({"_id": rollup_id(user_id, day)})
+    if rollup is not None:
+        return rollup
+
+    start = datetime.combine(day, time.min)
+    cursor = await async_meals_collection.aggregate([
+        {"$match": {"user_id": user_id, "timestamp": {"$gte": start, "$lt": start + timedelta(days=1)}}},
+        {
+            "$group": {
+                "_id": None,
+                **{n: {"$sum": f"$analysis.total_nutrition.{n}"} for n in NUTRIENTS},
+                "meals_count": {"$sum": 1},
+            }
+        },
+    ])
+    rows = await cursor.to_list(length=1)
+    return rows[0] if rows else None
+
+
+def rebuild_rollups(user_id: Optional[str] = None) -> int:
+    """
+    Recompute daily rollups from the meals collection (backfill / drift repair).
+    Returns the number of rollup documents in scope afterwards.
+
+    Rollups are replaced in place by $merge, never deleted first, so /summary
+    keeps serving and live $inc writes land on an existing document. Leftovers
+    for days that no longer have meals are removed afterwards; today is left
+    alone since its first meal may have arrived mid-rebuild.
+    """
+    scope = {"user_id": user_id} if user_id else {}
+    rebuilt_at = datetime.utcnow()
+
+    match = {**scope, "timestamp": {"$type": "date"}}
+    pipeline = [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
+                },
+                **{n: {"$sum": f"$analysis.total_nutrition.{n}"} for n in NUTRIENTS},
+                "meals_count": {"$sum": 1},
+            }
+        },
+        {
+            "$project": {
+                "_id": {"$concat": ["$_id.user_id", ":", "$_id.date"]},
+                "user_id": "$_id.user_id",
+                "date": "$_id.date",
+                **{n: 1 for n in NUTRIENTS},
+                "meals_count": 1,
+                "rebuilt_at": {"$literal": rebuilt_at},
+            }
+        },
+        {"$merge": {"into": rollups_collection.name, "whenMatched": "replace"}},
+    ]
+    meals_collection.aggregate(pipeline)
+
+    rollups_collection.delete_many({
+        **scope,
+        "rebuilt_at": {"$ne": rebuilt_at},
+        "date": {"$lt": rebuilt_at.date().isoformat()},
+    })
+    return rollups_collection.count_documents(scope)
@@ -0,0 +1,94 @@
+from collections import Counter
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.db.mongo import (
+    meals_collection,
+    posts_collection,
+    user_stats_collection,
+    async_user_stats_collection,
+)
+
+STAT_FIELDS = ("posts_count", "likes_received", "meals_count")
+
+
+def _inc(user_id: str, deltas: dict) -> UpdateOne:
+    return UpdateOne({"_id": user_id}, {"$inc": deltas}, upsert=True)
+
+
+async def inc_user_stats(user_id: str, **deltas: int) -> None:
+    """
+    Bump one user's denormalized counters, e.g. inc_user_stats(uid, posts_count=1).
+    """
+    await async_user_stats_collection.bulk_write([_inc(user_id, deltas)])
+
+
+async def inc_meal_counts(meals: list) -> None:
+    counts = Counter(meal["user_id"] for meal in meals)
+    await async_user_stats_collection.bulk_write(
+        [_inc(uid, {"meals_count": n}) for uid, n in counts.items()], ordered=False
+    )
+
+
+def inc_user_stats_sync(user_id: str, **deltas: int) -> None:
+    user_stats_collection.bulk_write([_inc(user_id, deltas)])
+
+
+async def get_user_stats(user_id: str) -> dict:
+    stats = await async_user_stats_collection.find_one({"_id": user_id}) or {}
+    return {field: stats.get(field, 0) for field in STAT_FIELDS}
+
+
+def rebuild_user_stats(user_id: Optional[str] = None) -> int:
+    """
+    Recompute counters from the posts and meals collections. Returns the
+    number of stats documents written.
+
+    Counters are overwritten with $set upserts rather than delete + insert, so
+    live $inc writes never hit a missing document or a duplicate key.
+    """
+    # Snapshot first: stats docs created after this point belong to new activity
+    existing = {
+        doc["_id"]
+        for doc in user_stats_collection.find({"_id": user_id} if user_id else {}, {"_id": 1})
+    }
+    posts_match = {"author_id": user_id} if user_id else {}
+    meals_match = {"user_id": user_id} if user_id else {}
+
+    stats = {}
+    for row in posts_collection.aggregate([
+        {"$match": posts_match},
+        {
+            "$group": {
+                "_id": "$author_id",
+                "posts_count": {"$sum": 1},
+                "likes_received": {"$sum": {"$ifNull": ["$likes_count", 0]}},
+            }
+        },
+    ]):
+        stats.setdefault(row["_id"], {}).update(
+            posts_count=row["posts_count"], likes_received=row["likes_received"]
+        )
+
+    for row in meals_collection.aggregate([
+        {"$match": meals_match},
+        {"$group": {"_id": "$user_id", "meals_count": {"$sum": 1}}},
+    ]):
+        stats.setdefault(row["_id"], {})["meals_count"] = row["meals_count"]
+
+    # Users whose posts and meals are all gone drop back to zero
+    for uid in existing - stats.keys():
+        stats[uid] = {}
+
+    writes = [
+        UpdateOne(
+            {"_id": uid},
+            {"$set": {field: values.get(field, 0) for field in STAT_FIELDS}},
+            upsert=True,
+        )
+        for uid, values in stats.items()
+    ]
+    if writes:
+        user_stats_collection.bulk_write(writes, ordered=False)
+    return len(writes)
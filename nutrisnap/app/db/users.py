@@ -0,0 +1,21 @@
+from typing import Optional
+
+from app.db.mongo import async_users_collection
+
+
+async def find_user_by_email(email: str, projection: Optional[dict] = None) -> Optional[dict]:
+    return await async_users_collection.find_one({"email": email}, projection)
+
+
+async def user_exists(email: str) -> bool:
+    return await async_users_collection.find_one({"email": email}, {"_id": 1}) is not None
+
+
+async def insert_user(user: dict):
+    return await async_users_collection.insert_one(user)
+
+
+async def update_password(user_id, hashed_password: str) -> None:
+    await async_users_collection.update_one(
+        {"_id": user_id}, {"$set": {"password": hashed_password}}
+    )
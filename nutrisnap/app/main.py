@@ -1,16 +1,74 @@
-from fastapi import FastAPI
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from app.routes import auth, analyze, history
 from app.routes import goals
 from app.routes import summary
+from app.core.config import (
+    MAX_REQUEST_BYTES,
+    MAX_BATCH_REQUEST_BYTES,
+    GEMINI_BREAKER_COOLDOWN_SECONDS,
+    MONGO_ENSURE_INDEXES,
+    MONGO_VERIFY_QUERY_PLANS,
+    TRUSTED_PROXIES,
+)
+from app.db.indexes import ensure_indexes, verify_query_plans, IndexBuildError
+from app.db.mongo import async_mongo_client
+from app.services.gemini import GeminiUnavailable
+from app.utils.concurrency import run_blocking
+from app.utils.responses import MongoJSONResponse
+from app.utils.uploads import RequestSizeLimit
+
+logger = logging.getLogger("nutrisnap")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not TRUSTED_PROXIES:
+        # Behind a load balancer every client would share its address in the
+        # login limiters; the first forwarded request logs an error as well
+        logger.warning("TRUSTED_PROXIES is not set: X-Forwarded-For is ignored")
+
+    # ---- Index bootstrap + query-plan self-check ----
+    # A unique index that can't be built (duplicate data) is logged, not fatal:
+    # `python -m app.manage ensure-indexes` fails hard and says what to fix
+    if MONGO_ENSURE_INDEXES:
+        try:
+            await run_blocking(ensure_indexes)
+        except IndexBuildError:
+            logger.exception("serving without some unique indexes")
+    if MONGO_VERIFY_QUERY_PLANS:
+        await run_blocking(verify_query_plans)
+    yield
+    await async_mongo_client.close()
 
 
 app = FastAPI(
     title="NutriSnap AI Backend",
-    version="4.0"
+    version="4.0",
+    lifespan=lifespan,
+    default_response_class=MongoJSONResponse,
 )
 
+# ---- Body size guard (reject before the multipart body is spooled) ----
+app.add_middleware(
+    RequestSizeLimit,
+    max_bytes=MAX_REQUEST_BYTES,
+    path_limits={"/analyze/batch": MAX_BATCH_REQUEST_BYTES},
+)
+
+# ---- Gemini brownouts surface as 503 instead of 500 ----
+@app.exception_handler(GeminiUnavailable)
+async def gemini_unavailable_handler(request: Request, exc: GeminiUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Food analysis is temporarily unavailable. Please retry shortly."},
+        headers={"Retry-After": str(int(GEMINI_BREAKER_COOLDOWN_SECONDS))},
+    )
+
 # ---- CORS ----
 app.add_middleware(
     CORSMiddleware,
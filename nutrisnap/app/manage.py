@@ -0,0 +1,120 @@
+"""
+Maintenance commands.
+
+    python -m app.manage ensure-indexes
+    python -m app.manage check-indexes
+    python -m app.manage rebuild-rollups [--user USER_ID]
+    python -m app.manage reconcile-likes
+    python -m app.manage reconcile-comments
+    python -m app.manage rebuild-user-stats [--user USER_ID]
+    python -m app.manage migrate-storage [--batch-size N]
+
+Deploying daily rollups on an existing database: run rebuild-rollups once
+(migrate-storage already ends with it). Until then /summary sums missing days
+from the meals directly, but a day whose first post-deploy meal created its
+rollup only counts that meal. Rebuilds are safe to run while serving traffic.
+"""
+import argparse
+import logging
+import sys
+
+
+def ensure_indexes(args) -> int:
+    from app.db.indexes import ensure_indexes, IndexBuildError
+    try:
+        failed = ensure_indexes()
+    except IndexBuildError as exc:
+        print(f"❌ {exc}")
+        return 1
+    if failed:
+        print("❌ Could not create: " + ", ".join(failed))
+        return 1
+    print("✅ Indexes ensured")
+    return 0
+
+
+def check_indexes(args) -> int:
+    from app.db.indexes import verify_query_plans
+    offenders = verify_query_plans()
+    if offenders:
+        print("❌ Collection scans: " + ", ".join(offenders))
+        return 1
+    print("✅ Every route query is index-backed")
+    return 0
+
+
+def rebuild_rollups(args) -> int:
+    from app.db.rollups import rebuild_rollups
+    written = rebuild_rollups(args.user)
+    print(f"✅ Rebuilt {written} daily rollups")
+    return 0
+
+
+def reconcile_likes(args) -> int:
+    from app.db.community import dedupe_likes, reconcile_like_counts
+    from app.db.indexes import ensure_indexes
+    from app.db.mongo import likes_collection
+
+    # Duplicates first, or the unique (post_id, user_id) index can't be built
+    removed = dedupe_likes()
+    print(f"   removed {removed} duplicate likes")
+    ensure_indexes([likes_collection])
+
+    corrected = reconcile_like_counts()
+    print(f"✅ Corrected likes_count on {corrected} posts")
+    if corrected:
+        # likes_received is derived from the per-post counters
+        return rebuild_user_stats(args)
+    return 0
+
+
+def reconcile_comments(args) -> int:
+    from app.db.community import reconcile_comment_counts
+    corrected = reconcile_comment_counts()
+    print(f"✅ Corrected comments_count on {corrected} posts")
+    return 0
+
+
+def rebuild_user_stats(args) -> int:
+    from app.db.stats import rebuild_user_stats
+    written = rebuild_user_stats(args.user)
+    print(f"✅ Rebuilt stats for {written} users")
+    return 0
+
+
+def migrate_storage(args) -> int:
+    from app.db.migrations import migrate_storage
+    for step, count in migrate_storage(args.batch_size).items():
+        print(f"   {step}: {count} documents")
+
+    # Meals only gained timestamps now, so their rollups are new too
+    args.user = None
+    rebuild_rollups(args)
+    print("✅ Storage migrated")
+    return 0
+
+
+COMMANDS = {
+    "ensure-indexes": ensure_indexes,
+    "check-indexes": check_indexes,
+    "rebuild-rollups": rebuild_rollups,
+    "reconcile-likes": reconcile_likes,
+    "reconcile-comments": reconcile_comments,
+    "rebuild-user-stats": rebuild_user_stats,
+    "migrate-storage": migrate_storage,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="NutriSnap maintenance commands")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--user", help="limit rebuild commands to one user id")
+    parser.add_argument("--batch-size", type=int, default=500, help="documents per migration batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    sys.exit(COMMANDS[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, AliasChoices
 from typing import List, Dict, Optional
 
 
@@ -9,26 +9,80 @@ class UserAuth(BaseModel):
 
 
 # ---------- Nutrition ----------
+# Older Gemini output / cached entries use unit-suffixed keys (protein_g, sodium_mg)
+def _nutrient(name: str, unit: str, description: str):
+    return Field(
+        0,
+        validation_alias=AliasChoices(name, f"{name}_{unit}"),
+        description=description,
+    )
+
+
 class Nutrition(BaseModel):
-    calories: float
-    protein: float
-    carbs: float
-    fat: float
-    fiber: float
-    sugar: float
-    sodium: float
+    calories: float = Field(0, description="kcal")
+    protein: float = _nutrient("protein", "g", "grams")
+    carbs: float = _nutrient("carbs", "g", "grams")
+    fat: float = _nutrient("fat", "g", "grams")
+    fiber: float = _nutrient("fiber", "g", "grams")
+    sugar: float = _nutrient("sugar", "g", "grams")
+    sodium: float = _nutrient("sodium", "mg", "milligrams")
+
+
+# Community posts have always stored totals under the unit-suffixed keys
+LEGACY_NUTRIENT_KEYS = {
+    "calories": "calories",
+    "protein": "protein_g",
+    "carbs": "carbs_g",
+    "fat": "fat_g",
+    "fiber": "fiber_g",
+    "sugar": "sugar_g",
+    "sodium": "sodium_mg",
+}
+
+
+def legacy_nutrition(nutrition: dict) -> dict:
+    return {
+        LEGACY_NUTRIENT_KEYS[name]: value
+        for name, value in Nutrition.model_validate(nutrition).model_dump().items()
+    }
 
 
 class FoodItem(BaseModel):
     name: str
-    confidence: float
-    estimated_weight_g: float
-    nutrition_per_portion: Nutrition
+    confidence: float = Field(0.9, description="0 to 1")
+    estimated_weight_g: float = Field(0, description="grams")
+    nutrition_per_portion: Nutrition = Field(default_factory=Nutrition)
+    source: str = "model"  # "kb" when macros come from the local nutrition table
 
 
 class MealAnalysis(BaseModel):
-    items: List[FoodItem]
-    total_nutrition: Nutrition
+    items: List[FoodItem] = Field(default_factory=list)
+    total_nutrition: Nutrition = Field(
+        default_factory=Nutrition, description="sum of all items"
+    )
+
+
+# ---------- Gemini output ----------
+class IdentifiedItem(BaseModel):
+    name: str
+    confidence: float = Field(0.9, description="0 to 1")
+    estimated_weight_g: float = Field(0, description="portion weight in grams")
+    nutrition_per_portion: Optional[Nutrition] = Field(
+        None, description="omit for foods from the known foods list"
+    )
+
+
+class MealIdentification(BaseModel):
+    items: List[IdentifiedItem] = Field(default_factory=list)
+
+
+class PackedMealResult(BaseModel):
+    image_index: int
+    analysis: MealIdentification
+
+
+class PackedMealAnalysis(BaseModel):
+    results: List[PackedMealResult]
 
 
 class AIAdvice(BaseModel):
@@ -41,6 +95,20 @@ class AIAdvice(BaseModel):
 class AnalyzeResponse(BaseModel):
     analysis: MealAnalysis
     image_url: str
+    cached: bool = False
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    analysis: Optional[MealAnalysis] = None
+    image_url: Optional[str] = None
+    cached: bool = False
+    error: Optional[str] = None
+
+
+class BatchAnalyzeResponse(BaseModel):
+    count: int
+    results: List[BatchItemResult]
 
 from pydantic import BaseModel
 from typing import Optional
@@ -57,4 +125,10 @@ class CommunityPostCreate(BaseModel):
 
 
 class CommentCreate(BaseModel):
-    text: str
+    # Older clients send {"comment": ...}
+    text: str = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        validation_alias=AliasChoices("text", "comment"),
+    )
@@ -1,81 +1,317 @@
-import io
-from fastapi import APIRouter, File, UploadFile, Form, Depends, HTTPException
-from PIL import Image
+import asyncio
+import json
+import logging
+import time
+from typing import List
+from fastapi import APIRouter, File, UploadFile, Form, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from app.core.config import (
+    BATCH_MAX_IMAGES,
+    BATCH_PACK_SIZE,
+    BATCH_CONCURRENCY,
+    JOB_WAIT_MAX_SECONDS,
+)
 from app.core.security import get_current_user
-from app.services.gemini import analyze_with_gemini
-from app.services.cloudinary import upload_image
-from app.db.mongo import meals_collection
-from app.models.schemas import AnalyzeResponse
+from app.services.gemini import (
+    analyze_with_gemini,
+    analyze_batch_with_gemini,
+    stream_analysis,
+    GeminiUnavailable,
+)
+from app.services.cloudinary import discard_upload, upload_image
+from app.services.phash import find_similar_analysis, phash_index
+from app.services.meals import build_meal_doc, error_detail
+from app.services.jobs import enqueue_job, get_job, DONE, FAILED
+from app.db.meals import insert_meal, insert_meals
+from app.models.schemas import AnalyzeResponse, BatchAnalyzeResponse
+from app.utils.concurrency import run_blocking, run_upstream, iterate_blocking
+from app.utils.uploads import load_image_upload
 
 router = APIRouter(tags=["Analyze"])
-
-
-# 🔹 Helper to normalize nutrition keys
-def normalize_nutrition(n: dict) -> dict:
-    return {
-        "calories": n.get("calories", 0),
-        "protein": n.get("protein_g", 0),
-        "carbs": n.get("carbs_g", 0),
-        "fat": n.get("fat_g", 0),
-        "fiber": n.get("fiber_g", 0),
-        "sugar": n.get("sugar_g", 0),
-        "sodium": n.get("sodium_mg", 0),
-    }
-
+logger = logging.getLogger(__name__)
 
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_food(
     image: UploadFile = File(...),
     cuisine_hint: str = Form(None),
+    async_mode: bool = Query(False, alias="async"),
     current_user: dict = Depends(get_current_user),
 ):
-    # Validate image
-    if not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Only image files are allowed")
-
-    # Read image
-    pil = Image.open(io.BytesIO(await image.read())).convert("RGB")
-
-    # 🔹 AI analysis (raw)
-    raw_analysis = analyze_with_gemini(pil, cuisine_hint)
-
-    # 🔹 Normalize items
-    items = []
-    for item in raw_analysis.get("items", []):
-        items.append({
-            "name": item.get("name"),
-            "confidence": item.get("confidence", 0.9),
-            "estimated_weight_g": item.get("estimated_weight_g", 0),
-            "nutrition_per_portion": normalize_nutrition(
-                item.get("nutrition_per_portion", {})
-            ),
-        })
+    # Validate size + real format, then decode, downscale and encode once
+    prepared = await load_image_upload(image)
 
-    # 🔹 Normalize totals
-    total_nutrition = normalize_nutrition(
-        raw_analysis.get("total_nutrition", {})
-    )
+    # 🔹 Async mode: queue the job for the worker pool and return immediately
+    if async_mode:
+        job_id = await run_blocking(
+            enqueue_job, prepared.jpeg, cuisine_hint,
+            str(current_user["_id"]), current_user["email"],
+        )
+        return JSONResponse(
+            status_code=202,
+            content={"job_id": job_id, "status": "queued"},
+        )
 
-    normalized_analysis = {
-        "items": items,
-        "total_nutrition": total_nutrition,
-    }
+    user_id = str(current_user["_id"])
 
-    # Upload image
-    image_url = upload_image(pil)
+    # 🔹 Upload starts right away; it never depends on the analysis
+    upload_task = asyncio.ensure_future(run_upstream(upload_image, prepared.jpeg))
+
+    try:
+        # 🔹 Near-duplicate lookup: reuse a prior analysis of the same dish
+        phash, cached_analysis = await run_blocking(
+            find_similar_analysis, prepared.image, user_id, cuisine_hint
+        )
+
+        if cached_analysis is not None:
+            normalized_analysis = cached_analysis
+        else:
+            # 🔹 AI analysis (validated MealAnalysis) runs in parallel with the upload
+            normalized_analysis = await run_upstream(
+                analyze_with_gemini, prepared.jpeg, cuisine_hint
+            )
+    except BaseException:
+        discard_upload(upload_task)
+        raise
+
+    image_url = await upload_task
 
     # Save to MongoDB
-    meal_doc = {
-        "user_id": str(current_user["_id"]),
-        "email": current_user["email"],
-        "image_url": image_url,
-        "analysis": normalized_analysis,
-    }
-    meals_collection.insert_one(meal_doc)
+    meal_doc = build_meal_doc(
+        user_id, current_user["email"],
+        image_url, normalized_analysis, phash, cuisine_hint,
+    )
+    meal_id = await insert_meal(meal_doc)
+    phash_index.add(int(phash, 16), meal_id, user_id, cuisine_hint)
 
     # ✅ Response matches AnalyzeResponse exactly
     return {
         "analysis": normalized_analysis,
         "image_url": image_url,
+        "cached": cached_analysis is not None,
+    }
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+@router.post("/analyze/stream")
+async def analyze_food_stream(
+    image: UploadFile = File(...),
+    cuisine_hint: str = Form(None),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    /analyze as server-sent events, emitted as each stage completes:
+    accepted -> items (repeated, partial) -> image -> analysis -> done,
+    or an `error` event if a stage fails after the stream has started.
+    """
+    # Validation errors still surface as regular 4xx responses
+    prepared = await load_image_upload(image)
+    user_id, email = str(current_user["_id"]), current_user["email"]
+
+    async def events():
+        yield _sse("accepted", {"width": prepared.image.width, "height": prepared.image.height})
+
+        upload_task = asyncio.ensure_future(run_upstream(upload_image, prepared.jpeg))
+        image_url, stored = None, False
+        try:
+            phash, analysis = await run_blocking(
+                find_similar_analysis, prepared.image, user_id, cuisine_hint
+            )
+            cached = analysis is not None
+
+            if analysis is None:
+                async for kind, data in iterate_blocking(
+                    stream_analysis, prepared.jpeg, cuisine_hint
+                ):
+                    if image_url is None and upload_task.done():
+                        image_url = upload_task.result()
+                        yield _sse("image", {"image_url": image_url})
+
+                    if kind == "items":
+                        yield _sse("items", {"items": data})
+                    else:
+                        analysis = data
+
+            if image_url is None:
+                image_url = await upload_task
+                yield _sse("image", {"image_url": image_url})
+
+            yield _sse("analysis", {"analysis": analysis, "cached": cached})
+
+            meal_id = await insert_meal(
+                build_meal_doc(user_id, email, image_url, analysis, phash, cuisine_hint)
+            )
+            stored = True
+            phash_index.add(int(phash, 16), meal_id, user_id, cuisine_hint)
+            yield _sse("done", {"meal_id": str(meal_id)})
+
+        except GeminiUnavailable:
+            yield _sse("error", {"detail": "Food analysis is temporarily unavailable. Please retry shortly."})
+        except Exception:
+            logger.exception("streaming analysis failed")
+            yield _sse("error", {"detail": "Food analysis failed"})
+        finally:
+            if not stored:
+                discard_upload(upload_task)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/analyze/jobs/{job_id}")
+async def get_analysis_job(
+    job_id: str,
+    wait: int = Query(0, ge=0, le=JOB_WAIT_MAX_SECONDS),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Job status/result. With wait=N, long-polls up to N seconds for completion.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        job = await run_blocking(get_job, job_id, str(current_user["_id"]))
+        if not job:
+            raise HTTPException(status_code=404, detail="Job not found")
+
+        if job["status"] in (DONE, FAILED) or time.monotonic() >= deadline:
+            return job
+
+        await asyncio.sleep(0.5)
+
+
+@router.post("/analyze/batch", response_model=BatchAnalyzeResponse)
+async def analyze_batch(
+    images: List[UploadFile] = File(...),
+    cuisine_hint: str = Form(None),
+    pack: bool = Form(True),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Analyze several meal photos at once. With pack=true, up to BATCH_PACK_SIZE
+    images share a single Gemini request; a group whose request fails is retried
+    one image per call.
+    """
+    if len(images) > BATCH_MAX_IMAGES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BATCH_MAX_IMAGES} images per batch",
+        )
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    lookup_semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def bounded(func, *args, limit=semaphore, run=run_upstream):
+        async with limit:
+            return await run(func, *args)
+
+    user_id = str(current_user["_id"])
+    results = [{"index": idx} for idx in range(len(images))]
+
+    # 🔹 Validate + preprocess every image
+    prepared = await asyncio.gather(
+        *(load_image_upload(image) for image in images), return_exceptions=True
+    )
+    ok = []
+    for idx, entry in enumerate(prepared):
+        if isinstance(entry, BaseException):
+            results[idx]["error"] = error_detail(entry)
+        else:
+            ok.append(idx)
+
+    # 🔹 Uploads start right away, bounded
+    uploads = {
+        idx: asyncio.ensure_future(bounded(upload_image, prepared[idx].jpeg))
+        for idx in ok
     }
+
+    # 🔹 Near-duplicate lookups, bounded separately so they don't queue behind uploads
+    lookups = await asyncio.gather(
+        *(
+            bounded(
+                find_similar_analysis, prepared[idx].image, user_id, cuisine_hint,
+                limit=lookup_semaphore, run=run_blocking,
+            )
+            for idx in ok
+        )
+    )
+    phashes, analyses = {}, {}
+    for idx, (phash, cached_analysis) in zip(ok, lookups):
+        phashes[idx] = phash
+        if cached_analysis is not None:
+            analyses[idx] = cached_analysis
+            results[idx]["cached"] = True
+
+    # 🔹 Gemini for the rest: packed groups, then one call per image for
+    # anything a failed group left behind (or everything with pack=false)
+    misses = [idx for idx in ok if idx not in analyses]
+    if pack:
+        groups = [
+            misses[start:start + BATCH_PACK_SIZE]
+            for start in range(0, len(misses), BATCH_PACK_SIZE)
+        ]
+        outcomes = await asyncio.gather(
+            *(
+                bounded(
+                    analyze_batch_with_gemini,
+                    [prepared[idx].jpeg for idx in group],
+                    cuisine_hint,
+                )
+                for group in groups
+            ),
+            return_exceptions=True,
+        )
+        misses = []
+        for group, outcome in zip(groups, outcomes):
+            if isinstance(outcome, GeminiUnavailable):
+                # Breaker is open: single calls would be rejected too
+                for idx in group:
+                    results[idx]["error"] = error_detail(outcome)
+            elif isinstance(outcome, BaseException):
+                logger.warning("packed analysis failed; retrying images one by one", exc_info=outcome)
+                misses.extend(group)
+            else:
+                analyses.update(zip(group, outcome))
+
+    outcomes = await asyncio.gather(
+        *(
+            bounded(analyze_with_gemini, prepared[idx].jpeg, cuisine_hint)
+            for idx in misses
+        ),
+        return_exceptions=True,
+    )
+    for idx, outcome in zip(misses, outcomes):
+        if isinstance(outcome, BaseException):
+            results[idx]["error"] = error_detail(outcome)
+        else:
+            analyses[idx] = outcome
+
+    # 🔹 Collect uploads and persist every successful meal in one write
+    upload_outcomes = await asyncio.gather(*uploads.values(), return_exceptions=True)
+    meal_docs, stored = [], []
+    for idx, outcome in zip(uploads, upload_outcomes):
+        if isinstance(outcome, BaseException):
+            results[idx]["error"] = error_detail(outcome)
+            continue
+        if idx not in analyses:
+            discard_upload(uploads[idx])
+            continue
+        results[idx]["analysis"] = analyses[idx]
+        results[idx]["image_url"] = outcome
+        meal_docs.append(build_meal_doc(
+            user_id, current_user["email"],
+            outcome, analyses[idx], phashes[idx], cuisine_hint,
+        ))
+        stored.append(idx)
+
+    if meal_docs:
+        inserted = await insert_meals(meal_docs)
+        for idx, meal_id in zip(stored, inserted.inserted_ids):
+            phash_index.add(int(phashes[idx], 16), meal_id, user_id, cuisine_hint)
+
+    return {"count": len(stored), "results": results}
@@ -1,44 +1,111 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 from datetime import datetime
+import asyncio
 
+from app.core.config import (
+    LOGIN_IP_BURST,
+    LOGIN_IP_PER_MINUTE,
+    LOGIN_ACCOUNT_BURST,
+    LOGIN_ACCOUNT_PER_MINUTE,
+    LOGIN_SLOWDOWN_BURST,
+    LOGIN_SLOWDOWN_PER_MINUTE,
+    LOGIN_SLOWDOWN_MAX_SECONDS,
+    TRUSTED_PROXIES,
+)
+from app.core.ratelimit import TokenBucketLimiter, ClientIP
 from app.core.security import (
-    get_password_hash,
-    verify_password,
-    create_access_token,
+    hash_password_async,
+    verify_and_update_async,
+    create_user_token,
+    invalidate_user,
 )
-from app.db.mongo import users_collection
+from app.db.users import user_exists, insert_user, find_user_by_email, update_password
 
 router = APIRouter(tags=["Auth"])
 
+client_ip = ClientIP(TRUSTED_PROXIES)
+# All three only count failed attempts; successful logins never spend a token
+ip_limiter = TokenBucketLimiter(LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE)
+failure_limiter = TokenBucketLimiter(LOGIN_ACCOUNT_BURST, LOGIN_ACCOUNT_PER_MINUTE)
+slowdown_limiter = TokenBucketLimiter(LOGIN_SLOWDOWN_BURST, LOGIN_SLOWDOWN_PER_MINUTE)
+
 
 class UserAuth(BaseModel):
     email: str
     password: str
 
 
+def _reject(retry_after: float) -> None:
+    if retry_after:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts. Please try again later.",
+            headers={"Retry-After": str(int(retry_after) + 1)},
+        )
+
+
+def _login_failed(email: str, ip: str, shared_ip: bool) -> HTTPException:
+    ip_limiter.acquire(ip)
+    if not shared_ip:
+        failure_limiter.acquire(f"{email}|{ip}")
+    slowdown_limiter.acquire(email)
+    return HTTPException(status_code=401, detail="Invalid credentials")
+
+
 @router.post("/register")
-async def register_user(data: UserAuth):
-    if users_collection.find_one({"email": data.email}):
+async def register_user(data: UserAuth, request: Request):
+    ip = client_ip(request)
+    _reject(ip_limiter.check(ip))
+
+    if await user_exists(data.email):
+        ip_limiter.acquire(ip)
         raise HTTPException(status_code=400, detail="User already exists")
 
-    hashed_password = get_password_hash(data.password)
-    users_collection.insert_one(
+    hashed_password = await hash_password_async(data.password)
+    await insert_user(
         {
             "email": data.email,
             "password": hashed_password,
-            "created": datetime.utcnow().isoformat(),
+            "created": datetime.utcnow(),
         }
     )
+    invalidate_user(data.email)
 
     return {"message": "✅ User registered successfully"}
 
 
 @router.post("/login")
-async def login_user(data: UserAuth):
-    user = users_collection.find_one({"email": data.email})
-    if not user or not verify_password(data.password, user["password"]):
-        raise HTTPException(status_code=401, detail="Invalid credentials")
+async def login_user(data: UserAuth, request: Request):
+    # Cheap checks first: a login storm is rejected before any bcrypt work
+    ip = client_ip(request)
+    # Behind an untrusted load balancer the address is shared by everyone, so
+    # it must not lock an account; the per-account slowdown still applies
+    shared_ip = client_ip.behind_unknown_proxy(request)
+    email = data.email.lower()
+    _reject(ip_limiter.check(ip))
+    # Too many failures from this client for this account; other clients
+    # (including the real owner) are unaffected
+    if not shared_ip:
+        _reject(failure_limiter.check(f"{email}|{ip}"))
+
+    # Account under attack from many addresses: slow down, don't lock out
+    delay = slowdown_limiter.check(email)
+    if delay:
+        await asyncio.sleep(min(delay, LOGIN_SLOWDOWN_MAX_SECONDS))
+
+    user = await find_user_by_email(data.email, {"email": 1, "password": 1})
+    if not user:
+        raise _login_failed(email, ip, shared_ip)
+
+    valid, new_hash = await verify_and_update_async(data.password, user["password"])
+    if not valid:
+        raise _login_failed(email, ip, shared_ip)
+
+    # Transparent rehash when CryptContext cost settings changed
+    if new_hash:
+        await update_password(user["_id"], new_hash)
+        invalidate_user(data.email)
 
-    token = create_access_token({"sub": data.email})
+    token = create_user_token(user)
     return {"access_token": token, "token_type": "bearer"}
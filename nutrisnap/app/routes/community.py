@@ -1,34 +1,56 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Request, Response
 from datetime import datetime
-from PIL import Image
-import io
+import asyncio
+
+from bson import ObjectId
 
 from app.core.security import get_current_user
-from app.services.cloudinary import upload_image
+from app.services.cloudinary import discard_upload, upload_image
 from app.services.gemini import analyze_with_gemini
-from app.db.mongo import posts_collection, likes_collection, comments_collection
-from app.models.schemas import CommunityPostCreate, CommentCreate
+from app.services.feed import cached_feed, invalidate_feed
+from app.db.community import (
+    insert_post,
+    delete_post,
+    add_like,
+    remove_like,
+    liked_post_ids,
+    insert_comment,
+    list_comments,
+    first_comments,
+)
+from app.models.schemas import CommunityPostCreate, CommentCreate, legacy_nutrition
+from app.utils.concurrency import run_upstream
+from app.utils.helpers import encode_cursor, decode_cursor
+from app.utils.responses import MongoJSONResponse
+from app.utils.uploads import load_image_upload
 
 
 router = APIRouter(prefix="/community", tags=["Community"])
+
+# Posts per /comments preview request (one feed page)
+MAX_PREVIEW_POSTS = 50
+
+
 @router.post("/post")
 async def create_post(
     image: UploadFile = File(...),
     caption: str = Form(...),
     current_user: dict = Depends(get_current_user)
 ):
-    # Validate image
-    if not image.content_type.startswith("image/"):
-        raise HTTPException(status_code=400, detail="Only images allowed")
+    # Validate size + real format before any decode or Gemini call
+    prepared = await load_image_upload(image)
 
-    pil = Image.open(io.BytesIO(await image.read())).convert("RGB")
+    # AI nutrition analysis + upload in parallel, off the event loop
+    upload_task = asyncio.ensure_future(run_upstream(upload_image, prepared.jpeg))
+    try:
+        analysis = await run_upstream(analyze_with_gemini, prepared.jpeg)
+        image_url = await upload_task
+    except BaseException:
+        discard_upload(upload_task)
+        raise
 
-    # AI nutrition analysis
-    analysis = analyze_with_gemini(pil)
-    nutrition = analysis.get("total_nutrition", {})
-
-    # Upload image
-    image_url = upload_image(pil)
+    # Same keys as every post stored before (protein_g, sodium_mg, ...)
+    nutrition = legacy_nutrition(analysis.get("total_nutrition", {}))
 
     post = {
         "author_id": str(current_user["_id"]),
@@ -37,84 +59,183 @@ async def create_post(
         "caption": caption,
         "nutrition": nutrition,
         "likes_count": 0,
-        "created_at": datetime.utcnow().isoformat(),
+        "comments_count": 0,
+        "created_at": datetime.utcnow(),
     }
 
-    posts_collection.insert_one(post)
+    try:
+        await insert_post(post)
+    except BaseException:
+        discard_upload(upload_task)
+        raise
+    invalidate_feed()
 
     return {"message": "Post created successfully"}
+
+
+@router.delete("/post/{post_id}")
+async def remove_post(
+    post_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    post = await delete_post(post_id, str(current_user["_id"]))
+    if not post:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    invalidate_feed()
+    return {"message": "Post deleted"}
 from fastapi import Query
 
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
 @router.get("/feed")
-def get_feed(
-    page: int = Query(1, ge=1),
-    limit: int = Query(10, le=50),
+async def get_feed(
+    request: Request,
+    page: int | None = Query(None, ge=1),
+    cursor: str | None = None,
+    limit: int = Query(10, ge=1, le=50),
     search: str | None = None,
+    include_total: bool = True,
 ):
-    skip = (page - 1) * limit
-
-    query = {}
-    if search:
-        query = {"$text": {"$search": search}}
-
-    posts = list(
-        posts_collection.find(query, {"_id": 0})
-        .sort("created_at", -1)
-        .skip(skip)
-        .limit(limit)
-    )
-
-    total = posts_collection.count_documents(query)
-
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "has_more": skip + limit < total,
-        "posts": posts,
-    }
+    # Total is approximate (collection metadata / short-lived cached count)
+    payload, etag = await cached_feed(search, limit, page, cursor, include_total)
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    # Already rendered (and cached) as JSON bytes
+    return Response(payload, media_type="application/json", headers=headers)
+
+def _post_oid(post_id: str) -> ObjectId:
+    if not ObjectId.is_valid(post_id):
+        raise HTTPException(status_code=404, detail="Post not found")
+    return ObjectId(post_id)
+
+
+async def _set_like(post_id: str, user_id: str, liked: bool) -> dict:
+    oid = _post_oid(post_id)
+    changed, likes_count = await (add_like if liked else remove_like)(oid, user_id)
+    if likes_count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    if changed:
+        invalidate_feed()
+    return {"liked": liked, "likes_count": likes_count}
+
+
+@router.put("/like/{post_id}")
+async def like_post(
+    post_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    return await _set_like(post_id, str(current_user["_id"]), True)
+
+
+@router.delete("/like/{post_id}")
+async def unlike_post(
+    post_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    return await _set_like(post_id, str(current_user["_id"]), False)
+
 
 @router.post("/like/{post_id}")
-def like_post(
+async def toggle_like(
     post_id: str,
     current_user: dict = Depends(get_current_user)
 ):
-    exists = likes_collection.find_one(
-        {"post_id": post_id, "user_id": str(current_user["_id"])}
-    )
-
-    if exists:
-        likes_collection.delete_one({"_id": exists["_id"]})
-        posts_collection.update_one(
-            {"_id": post_id}, {"$inc": {"likes_count": -1}}
-        )
-        return {"liked": False}
-
-    likes_collection.insert_one(
-        {"post_id": post_id, "user_id": str(current_user["_id"])}
-    )
-    posts_collection.update_one(
-        {"_id": post_id}, {"$inc": {"likes_count": 1}}
-    )
-    return {"liked": True}
+    # Try to like first; an existing like (unique index) means this is an unlike
+    user_id = str(current_user["_id"])
+    changed, likes_count = await add_like(_post_oid(post_id), user_id)
+    if likes_count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+    if not changed:
+        return await _set_like(post_id, user_id, False)
+
+    invalidate_feed()
+    return {"liked": True, "likes_count": likes_count}
+
+
+@router.get("/likes/me")
+async def my_likes(
+    post_ids: str = Query(..., description="Comma-separated post ids"),
+    current_user: dict = Depends(get_current_user)
+):
+    ids = [pid for pid in post_ids.split(",") if pid][:100]
+    liked = await liked_post_ids(str(current_user["_id"]), ids)
+    return {"liked": liked}
+
+
 @router.post("/comment/{post_id}")
-def comment_post(
+async def comment_post(
     post_id: str,
     data: CommentCreate,
     current_user: dict = Depends(get_current_user)
 ):
     comment = {
-        "post_id": post_id,
         "user_id": str(current_user["_id"]),
-        "comment": data.comment,
-        "created_at": datetime.utcnow().isoformat(),
+        "text": data.text,
+        "created_at": datetime.utcnow(),
     }
-    comments_collection.insert_one(comment)
-    return {"message": "Comment added"}
+    comments_count = await insert_comment(_post_oid(post_id), comment)
+    if comments_count is None:
+        raise HTTPException(status_code=404, detail="Post not found")
+
+    invalidate_feed()
+    return {"message": "Comment added", "comments_count": comments_count}
+
+
+@router.get("/comments")
+async def get_comment_previews(
+    post_ids: str = Query(..., description="Comma-separated post ids"),
+    k: int = Query(3, ge=1, le=10),
+):
+    # First k comments for a whole feed page in one round trip
+    ids = [pid for pid in post_ids.split(",") if pid]
+    if len(ids) > MAX_PREVIEW_POSTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_PREVIEW_POSTS} post ids per request",
+        )
+    if not all(ObjectId.is_valid(pid) for pid in ids):
+        raise HTTPException(status_code=400, detail="Invalid post id")
+
+    previews = await first_comments(ids, k)
+    return MongoJSONResponse({"comments": {pid: previews.get(pid, []) for pid in ids}})
+
+
 @router.get("/comments/{post_id}")
-def get_comments(post_id: str):
-    comments = list(
-        comments_collection.find({"post_id": post_id}, {"_id": 0})
-        .sort("created_at", 1)
-    )
-    return {"count": len(comments), "comments": comments}
+async def get_comments(
+    post_id: str,
+    cursor: str | None = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    comments = await list_comments(post_id, limit + 1, after)
+    has_more = len(comments) > limit
+    comments = comments[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = comments[-1]
+        next_cursor = encode_cursor(last["created_at"], last["_id"])
+
+    return MongoJSONResponse({
+        "count": len(comments),
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "comments": comments,
+    })
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
-from bson import json_util
-import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from datetime import date, datetime, time, timedelta
+from typing import Optional
 
 from app.core.security import get_current_user
-from app.db.mongo import meals_collection, mongo_client
-from app.services.gemini import MODEL
-from app.utils.helpers import safe_json
+from app.db.mongo import async_mongo_client
+from app.core.config import EXPORT_BATCH_SIZE
+from app.db.meals import list_recent_meals, iter_meals, get_meal, delete_meal
+from app.services.phash import phash_index
+from app.services.export import export_stream
+from app.services.gemini import MODEL, cache_stats, client_stats
+from app.services.feed import feed_cache_stats
+from app.utils.responses import MongoJSONResponse
 
 
 router = APIRouter(tags=["History"])
@@ -15,30 +20,77 @@ router = APIRouter(tags=["History"])
 
 
 @router.get("/history")
-def get_user_history(
-    limit: int = 5,
+async def get_user_history(
+    limit: int = Query(5, ge=1, le=100),
     current_user: dict = Depends(get_current_user),
 ):
-    meals = list(
-        meals_collection.find({"user_id": str(current_user["_id"])})
-        .sort("timestamp", -1)
-        .limit(limit)
-    )
+    meals = await list_recent_meals(str(current_user["_id"]), limit)
+
+    # ObjectId / datetime are encoded in one pass
+    return MongoJSONResponse({
+        "count": len(meals),
+        "meals": meals,
+    })
+
+
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
 
-    return JSONResponse(
-        content=safe_json(
-            {
-                "count": len(meals),
-                "meals": meals,
-            }
-        )
+@router.get("/history/export")
+async def export_history(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Stream the user's meals (UTC days, both ends inclusive) as NDJSON or CSV.
+    Rows are read from the cursor batch by batch, so memory stays flat.
+    """
+    start = datetime.combine(from_date, time.min) if from_date else None
+    end = datetime.combine(to_date + timedelta(days=1), time.min) if to_date else None
+
+    meals = iter_meals(str(current_user["_id"]), start, end, EXPORT_BATCH_SIZE)
+
+    filename = f"nutrisnap-history.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_stream(meals, format, gzip),
+        media_type="application/gzip" if gzip else EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
+@router.get("/history/{meal_id}")
+async def get_user_meal(
+    meal_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    # Full meal including the per-item breakdown
+    meal = await get_meal(str(current_user["_id"]), meal_id)
+    if not meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+
+    return MongoJSONResponse(meal)
+
+
+@router.delete("/history/{meal_id}")
+async def delete_user_meal(
+    meal_id: str,
+    current_user: dict = Depends(get_current_user),
+):
+    meal = await delete_meal(str(current_user["_id"]), meal_id)
+    if not meal:
+        raise HTTPException(status_code=404, detail="Meal not found")
+    phash_index.remove(meal["_id"])
+
+    return {"message": "Meal deleted"}
+
+
 @router.get("/health")
-def health():
+async def health():
     try:
-        mongo_client.admin.command("ping")
+        await async_mongo_client.admin.command("ping")
         db_status = True
     except Exception:
         db_status = False
@@ -47,4 +99,7 @@ def health():
         "ok": True,
         "model": MODEL,
         "db_connected": db_status,
+        "analysis_cache": cache_stats(),
+        "gemini": client_stats(),
+        "feed_cache": feed_cache_stats(),
     }
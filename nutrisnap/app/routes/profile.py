@@ -1,51 +1,32 @@
-from fastapi import APIRouter
-from app.db.mongo import posts_collection, likes_collection
+from fastapi import APIRouter, Query
+from app.db.stats import get_user_stats
+from app.services.feed import page_posts
+from app.utils.responses import MongoJSONResponse
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 @router.get("/{user_id}")
-def get_profile(user_id: str):
-    total_posts = posts_collection.count_documents(
-        {"author_id": user_id}
-    )
-
-    total_likes = sum(
-        post.get("likes_count", 0)
-        for post in posts_collection.find(
-            {"author_id": user_id},
-            {"likes_count": 1}
-        )
-    )
+async def get_profile(user_id: str):
+    # Counters are maintained by the post/like write paths. Public, so only
+    # community activity: meals_count stays private to its owner.
+    stats = await get_user_stats(user_id)
 
     return {
         "user_id": user_id,
-        "total_posts": total_posts,
-        "total_likes": total_likes,
+        "total_posts": stats["posts_count"],
+        "total_likes": stats["likes_received"],
     }
 @router.get("/{user_id}/posts")
-def get_user_posts(
+async def get_user_posts(
     user_id: str,
-    page: int = 1,
-    limit: int = 10,
+    page: int | None = Query(None, ge=1),
+    cursor: str | None = None,
+    limit: int = Query(10, ge=1, le=50),
+    include_total: bool = True,
 ):
-    skip = (page - 1) * limit
-
-    posts = list(
-        posts_collection.find(
-            {"author_id": user_id},
-            {"_id": 0}
-        )
-        .sort("created_at", -1)
-        .skip(skip)
-        .limit(limit)
-    )
-
-    total = posts_collection.count_documents(
-        {"author_id": user_id}
-    )
-
-    return {
-        "page": page,
-        "limit": limit,
-        "total": total,
-        "posts": posts,
-    }
+    return MongoJSONResponse(await page_posts(
+        {"author_id": user_id},
+        limit,
+        page=page if page or cursor else 1,
+        cursor=cursor,
+        include_total=include_total,
+    ))
@@ -1,66 +1,51 @@
-from fastapi import APIRouter, Depends
-from datetime import datetime, date
+from fastapi import APIRouter, Depends, HTTPException, Query
+from datetime import datetime, date, timedelta, timezone
 from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import asyncio
 
 from app.core.security import get_current_user
-from app.db.mongo import meals_collection, goals_collection
+from app.db.goals import get_goals
+from app.db.meals import aggregate_range
+from app.db.rollups import get_rollup, NUTRIENTS
 
 router = APIRouter(tags=["Summary"])
+
+# Defaults if no goals set
+DEFAULT_GOALS = {
+    "daily_calories": 2000,
+    "protein_g": 100,
+    "carbs_g": 250,
+    "fat_g": 70,
+}
+
+MAX_RANGE_DAYS = 366
+
+# A logged day counts as "on target" within this band of the calorie goal
+CALORIE_TARGET_BAND = 0.1
+
+
 @router.get("/summary")
-def daily_summary(
+async def daily_summary(
     summary_date: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    # Parse date
+    # Parse date (days are UTC, matching the rollup keys)
     if summary_date:
         day = datetime.fromisoformat(summary_date).date()
     else:
-        day = date.today()
-
-    start = datetime.combine(day, datetime.min.time())
-    end = datetime.combine(day, datetime.max.time())
-
-    # Fetch meals of the day
-    meals = list(
-        meals_collection.find(
-            {
-                "user_id": str(current_user["_id"]),
-                "timestamp": {
-                    "$gte": start.isoformat(),
-                    "$lte": end.isoformat(),
-                },
-            }
-        )
-    )
-
-    # Aggregate nutrition
-    totals = {
-        "calories": 0,
-        "protein": 0,
-        "carbs": 0,
-        "fat": 0,
-    }
+        day = datetime.utcnow().date()
 
-    for meal in meals:
-        nutrition = meal["analysis"]["total_nutrition"]
-        totals["calories"] += nutrition.get("calories", 0)
-        totals["protein"] += nutrition.get("protein", 0)
-        totals["carbs"] += nutrition.get("carbs", 0)
-        totals["fat"] += nutrition.get("fat", 0)
-
-    # Fetch user goals
-    goals = goals_collection.find_one(
-        {"user_id": str(current_user["_id"])},
-        {"_id": 0}
+    # Daily rollup (single point read) + goals, concurrently
+    rollup, goals = await asyncio.gather(
+        get_rollup(str(current_user["_id"]), day),
+        get_goals(str(current_user["_id"])),
     )
+    rollup = rollup or {}
 
-    # Defaults if no goals set
-    goals = goals or {
-        "daily_calories": 2000,
-        "protein_g": 100,
-        "carbs_g": 250,
-        "fat_g": 70,
-    }
+    totals = {n: round(rollup.get(n, 0), 1) for n in NUTRIENTS}
+
+    goals = goals or DEFAULT_GOALS
 
     # Progress calculation
     progress = {
@@ -75,5 +60,109 @@ def daily_summary(
         "totals": totals,
         "goals": goals,
         "progress": progress,
-        "meals_count": len(meals),
+        "meals_count": rollup.get("meals_count", 0),
+    }
+
+
+def _local_date(value: datetime, tz: ZoneInfo) -> date:
+    # $dateTrunc returns the UTC instant of local midnight
+    return value.replace(tzinfo=timezone.utc).astimezone(tz).date()
+
+
+def _streaks(days: list, last_day: date) -> dict:
+    longest = run = 0
+    previous = None
+    for day in days:
+        run = run + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+
+    # Current streak may end today or (if today isn't logged yet) yesterday
+    current = 0
+    if days and last_day - days[-1] <= timedelta(days=1):
+        current = 1
+        for earlier, later in zip(reversed(days[:-1]), reversed(days)):
+            if later - earlier != timedelta(days=1):
+                break
+            current += 1
+
+    return {"current": current, "longest": longest}
+
+
+@router.get("/summary/range")
+async def range_summary(
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    tz: str = "UTC",
+    current_user: dict = Depends(get_current_user)
+):
+    try:
+        zone = ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(status_code=400, detail="Unknown timezone")
+
+    to_date = to_date or datetime.now(zone).date()
+    from_date = from_date or to_date - timedelta(days=29)
+    if from_date > to_date:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (to_date - from_date).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range is limited to {MAX_RANGE_DAYS} days",
+        )
+
+    # Local day boundaries -> naive UTC, matching the stored timestamps
+    def utc_midnight(day: date) -> datetime:
+        local = datetime.combine(day, datetime.min.time(), tzinfo=zone)
+        return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+    result, goals = await asyncio.gather(
+        aggregate_range(
+            str(current_user["_id"]),
+            utc_midnight(from_date),
+            utc_midnight(to_date + timedelta(days=1)),
+            bucket,
+            tz,
+        ),
+        get_goals(str(current_user["_id"])),
+    )
+    goals = goals or DEFAULT_GOALS
+
+    calorie_goal = goals["daily_calories"]
+    low = calorie_goal * (1 - CALORIE_TARGET_BAND)
+    high = calorie_goal * (1 + CALORIE_TARGET_BAND)
+
+    buckets = []
+    for row in result["buckets"]:
+        days_logged = row["days_logged"]
+        averages = {n: row[n] / days_logged for n in NUTRIENTS}
+        on_target = sum(1 for kcal in row["days_calories"] if low <= kcal <= high)
+
+        buckets.append({
+            "start": str(_local_date(row["_id"], zone)),
+            "totals": {n: round(row[n], 1) for n in NUTRIENTS},
+            "daily_average": {n: round(v, 1) for n, v in averages.items()},
+            "meals_count": row["meals_count"],
+            "days_logged": days_logged,
+            "adherence": {
+                "calories_pct": round((averages["calories"] / calorie_goal) * 100, 1),
+                "protein_pct": round((averages["protein"] / goals["protein_g"]) * 100, 1),
+                "carbs_pct": round((averages["carbs"] / goals["carbs_g"]) * 100, 1),
+                "fat_pct": round((averages["fat"] / goals["fat_g"]) * 100, 1),
+                "days_on_target_pct": round((on_target / days_logged) * 100, 1),
+            },
+        })
+
+    logged_days = [_local_date(row["_id"], zone) for row in result["days"]]
+
+    return {
+        "from": str(from_date),
+        "to": str(to_date),
+        "bucket": bucket,
+        "timezone": tz,
+        "goals": goals,
+        "buckets": buckets,
+        "days_logged": len(logged_days),
+        "streak": _streaks(logged_days, to_date),
     }
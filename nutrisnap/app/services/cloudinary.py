@@ -1,13 +1,18 @@
+import asyncio
 import io
+import logging
+import re
 import cloudinary
 import cloudinary.uploader
-from PIL import Image
 
 from app.core.config import (
     CLOUDINARY_CLOUD_NAME,
     CLOUDINARY_API_KEY,
     CLOUDINARY_API_SECRET,
 )
+from app.utils.concurrency import run_upstream
+
+logger = logging.getLogger(__name__)
 
 # Configure Cloudinary
 cloudinary.config(
@@ -18,18 +23,53 @@ cloudinary.config(
 )
 
 
-def upload_image(pil_image: Image.Image) -> str:
+def upload_image(image_bytes: bytes) -> str:
     """
-    Upload PIL image to Cloudinary and return secure URL.
+    Upload pre-encoded JPEG bytes to Cloudinary and return secure URL.
     """
-    buf = io.BytesIO()
-    pil_image.save(buf, format="JPEG", quality=90)
-    buf.seek(0)
-
     result = cloudinary.uploader.upload(
-        buf,
+        io.BytesIO(image_bytes),
         folder="nutrisnap_meals",
         resource_type="image",
     )
 
     return result["secure_url"]
+
+
+# .../image/upload/v1712345678/nutrisnap_meals/abc123.jpg -> nutrisnap_meals/abc123
+_PUBLIC_ID = re.compile(r"/upload/(?:v\d+/)?(.+?)(?:\.[A-Za-z0-9]+)?$")
+
+
+def delete_image(image_url: str) -> None:
+    """
+    Remove an uploaded image (e.g. when its meal was never stored).
+    """
+    match = _PUBLIC_ID.search(image_url)
+    if match:
+        cloudinary.uploader.destroy(match.group(1), resource_type="image")
+
+
+# Strong refs so pending cleanups aren't garbage-collected mid-flight
+_cleanups = set()
+
+
+async def _delete_upload(image_url: str) -> None:
+    try:
+        await run_upstream(delete_image, image_url)
+    except Exception:
+        logger.exception("failed to delete orphaned upload %s", image_url)
+
+
+def discard_upload(upload_task: asyncio.Future) -> None:
+    """
+    Nothing will reference this upload: delete the image once it finishes.
+    Cancelling wouldn't help, the executor thread keeps uploading anyway.
+    """
+    def cleanup(task: asyncio.Future) -> None:
+        if task.cancelled() or task.exception() is not None:
+            return
+        pending = asyncio.ensure_future(_delete_upload(task.result()))
+        _cleanups.add(pending)
+        pending.add_done_callback(_cleanups.discard)
+
+    upload_task.add_done_callback(cleanup)
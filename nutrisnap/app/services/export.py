@@ -0,0 +1,77 @@
+import csv
+import io
+import zlib
+from typing import AsyncIterator, Iterable
+
+from app.db.rollups import NUTRIENTS
+from app.utils.responses import bson_default, dumps
+
+EXPORT_COLUMNS = ("meal_id", "timestamp", "image_url", "items_count") + NUTRIENTS
+
+# Flush to the client once this much output has accumulated
+CHUNK_BYTES = 64 * 1024
+
+
+def flatten_meal(meal: dict) -> dict:
+    analysis = meal.get("analysis") or {}
+    totals = analysis.get("total_nutrition") or {}
+    return {
+        "meal_id": str(meal["_id"]),
+        "timestamp": bson_default(meal["timestamp"]) if meal.get("timestamp") else None,
+        "image_url": meal.get("image_url"),
+        "items_count": analysis.get("items_count"),
+        **{n: totals.get(n, 0) for n in NUTRIENTS},
+    }
+
+
+async def _ndjson(meals: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    async for meal in meals:
+        yield dumps(flatten_meal(meal)) + b"\n"
+
+
+async def _csv(meals: AsyncIterator[dict]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+
+    async for meal in meals:
+        writer.writerow(flatten_meal(meal))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _chunked(parts: AsyncIterator[bytes], compress: bool) -> AsyncIterator[bytes]:
+    """
+    Coalesce small per-row writes into CHUNK_BYTES chunks, gzipping on the fly.
+    """
+    gzipper = zlib.compressobj(wbits=31) if compress else None
+    pending: list = []
+    size = 0
+
+    def drain(data: Iterable[bytes]) -> bytes:
+        raw = b"".join(data)
+        return gzipper.compress(raw) if gzipper else raw
+
+    async for part in parts:
+        pending.append(part)
+        size += len(part)
+        if size >= CHUNK_BYTES:
+            chunk = drain(pending)
+            pending, size = [], 0
+            if chunk:
+                yield chunk
+
+    tail = drain(pending)
+    if gzipper:
+        tail += gzipper.flush()
+    if tail:
+        yield tail
+
+
+def export_stream(meals: AsyncIterator[dict], fmt: str, compress: bool) -> AsyncIterator[bytes]:
+    rows = _csv(meals) if fmt == "csv" else _ndjson(meals)
+    return _chunked(rows, compress)
@@ -0,0 +1,134 @@
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from fastapi import HTTPException
+
+from app.core.config import FEED_CACHE_SIZE, FEED_CACHE_TTL_SECONDS, FEED_CACHE_PAGES
+from app.db.community import list_posts, approximate_post_count
+from app.utils.helpers import encode_cursor, decode_cursor
+from app.utils.responses import dumps
+
+
+async def page_posts(
+    query: dict,
+    limit: int,
+    page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+) -> dict:
+    """
+    One page of posts for `query`, newest first.
+
+    A `cursor` (the previous response's next_cursor) seeks straight to the next
+    page via the (created_at, _id) index, so latency doesn't grow with depth.
+    `page` is still accepted for older clients and falls back to skip/limit.
+    """
+    after = None
+    skip = 0
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    elif page:
+        skip = (page - 1) * limit
+
+    # Fetch one extra row to learn whether another page exists
+    if include_total:
+        posts, total = await asyncio.gather(
+            list_posts(query, limit + 1, skip=skip, after=after),
+            approximate_post_count(query),
+        )
+    else:
+        posts, total = await list_posts(query, limit + 1, skip=skip, after=after), None
+
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = posts[-1]
+        next_cursor = encode_cursor(last["created_at"], last["_id"])
+
+    result = {
+        "limit": limit,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "posts": posts,
+    }
+    if page and not cursor:
+        result["page"] = page
+    if include_total:
+        result["total"] = total
+    return result
+
+
+# ---- Feed cache ----
+# key -> (etag, rendered JSON bytes). Cleared on any write that changes what a feed
+# page shows; the TTL bounds staleness across processes.
+_feed_cache = TTLCache(maxsize=FEED_CACHE_SIZE, ttl=FEED_CACHE_TTL_SECONDS)
+_feed_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def normalize_search(search: Optional[str]) -> str:
+    return " ".join(search.lower().split()) if search else ""
+
+
+def _etag(payload: bytes) -> str:
+    return '"' + hashlib.blake2b(payload, digest_size=12).hexdigest() + '"'
+
+
+async def cached_feed(
+    search: Optional[str],
+    limit: int,
+    page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+) -> Tuple[bytes, str]:
+    """
+    Rendered feed page plus its ETag, served from the in-process cache when
+    possible (a hit costs neither a query nor a serialization).
+    Deep offset pages (page > FEED_CACHE_PAGES) always go to Mongo.
+    """
+    search = normalize_search(search)
+    query = {"$text": {"$search": search}} if search else {}
+
+    cacheable = bool(cursor) or (page or 1) <= FEED_CACHE_PAGES
+    key = (search, limit, cursor or page or 1, include_total)
+
+    if cacheable:
+        cached = _feed_cache.get(key)
+        if cached:
+            _feed_stats["hits"] += 1
+            return cached[1], cached[0]
+
+    _feed_stats["misses"] += 1
+    body = await page_posts(
+        query,
+        limit,
+        page=page if page or cursor else 1,
+        cursor=cursor,
+        include_total=include_total,
+    )
+    payload = dumps(body)
+    etag = _etag(payload)
+
+    if cacheable:
+        _feed_cache[key] = (etag, payload)
+    return payload, etag
+
+
+def invalidate_feed() -> None:
+    _feed_cache.clear()
+    _feed_stats["invalidations"] += 1
+
+
+def feed_cache_stats() -> Dict[str, Any]:
+    lookups = _feed_stats["hits"] + _feed_stats["misses"]
+    return {
+        **_feed_stats,
+        "entries": len(_feed_cache),
+        "hit_rate": round(_feed_stats["hits"] / lookups, 3) if lookups else 0.0,
+    }
@@ -82,22 +82,116 @@
 #     )
 
 #     return _force_json(response.text or "")
-import io
 import json
-from typing import Optional, Dict, Any
-from PIL import Image
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 import google.generativeai as genai
-
-from app.core.config import GOOGLE_API_KEY
+from google.api_core import exceptions as google_exceptions
+from cachetools import TTLCache
+from pydantic import BaseModel
+
+from app.core.config import (
+    GOOGLE_API_KEY,
+    ANALYSIS_CACHE_SIZE,
+    ANALYSIS_CACHE_TTL_SECONDS,
+    GEMINI_TIMEOUT_SECONDS,
+    GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_BASE_SECONDS,
+    GEMINI_BACKOFF_MAX_SECONDS,
+    GEMINI_HEDGE_ENABLED,
+    GEMINI_HEDGE_AFTER_SECONDS,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_BREAKER_THRESHOLD,
+    GEMINI_BREAKER_COOLDOWN_SECONDS,
+)
+from app.db.mongo import analysis_cache_collection
+from app.models.schemas import MealAnalysis, MealIdentification, PackedMealAnalysis
+from app.services.nutrition_kb import nutrition_kb, build_analysis
 
 genai.configure(api_key=GOOGLE_API_KEY)
 
 MODEL = "models/gemini-2.5-flash"
 
+# ---- Analysis cache (in-process LRU/TTL tier backed by Mongo) ----
+_cache = TTLCache(maxsize=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+_cache_stats = {
+    "memory_hits": 0,
+    "db_hits": 0,
+    "misses": 0,
+    "gemini_seconds": 0.0,
+}
+
+
+_JSON_TYPES = {
+    "string": "STRING",
+    "number": "NUMBER",
+    "integer": "INTEGER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT",
+}
 
-def _force_json(text: str) -> dict:
+
+def _response_schema(model: type[BaseModel]) -> dict:
     """
-    Extract valid JSON from Gemini output safely.
+    Derive a Gemini response_schema (OpenAPI subset) from a pydantic model.
+    """
+    root = model.model_json_schema()
+    defs = root.get("$defs", {})
+
+    def convert(node: dict) -> dict:
+        nullable = False
+        if "anyOf" in node:  # Optional[X]
+            options = [o for o in node["anyOf"] if o.get("type") != "null"]
+            nullable = len(options) < len(node["anyOf"])
+            node = {**options[0], **{k: v for k, v in node.items() if k != "anyOf"}}
+        if "$ref" in node:
+            resolved = defs[node["$ref"].split("/")[-1]]
+            node = {**resolved, **{k: v for k, v in node.items() if k != "$ref"}}
+
+        out = {"type": _JSON_TYPES[node["type"]]}
+        if nullable:
+            out["nullable"] = True
+        if node.get("description"):
+            out["description"] = node["description"]
+        if "items" in node:
+            out["items"] = convert(node["items"])
+        if "properties" in node:
+            out["properties"] = {
+                name: convert(prop) for name, prop in node["properties"].items()
+            }
+            # Non-optional fields are required from the model; defaults only cover repairs
+            out["required"] = [
+                name for name, prop in out["properties"].items()
+                if not prop.get("nullable")
+            ]
+        return out
+
+    return convert(root)
+
+
+_SCHEMAS = {
+    MealIdentification: _response_schema(MealIdentification),
+    PackedMealAnalysis: _response_schema(PackedMealAnalysis),
+}
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def _repair_json(text: str) -> str:
+    """
+    Best-effort repair of model output: strips markdown fences and surrounding
+    prose, drops trailing commas, and closes truncated output after the last
+    complete object/array.
     """
     text = text.strip()
 
@@ -108,85 +202,595 @@ def _force_json(text: str) -> dict:
             if not line.strip().startswith("```")
         )
 
-    start, end = text.find("{"), text.rfind("}")
-    if start == -1 or end == -1:
+    start = text.find("{")
+    if start == -1:
         raise ValueError("No JSON object found in Gemini response")
 
-    return json.loads(text[start:end + 1])
+    stack, in_string, escaped = [], False, False
+    safe_end, safe_stack = None, None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack or stack.pop() != ch:
+                raise ValueError("Unbalanced JSON in Gemini response")
+            if not stack:
+                return _TRAILING_COMMA.sub(r"\1", text[start:i + 1])
+            safe_end, safe_stack = i + 1, list(stack)
+
+    if safe_end is None:
+        raise ValueError("Truncated JSON in Gemini response")
+
+    repaired = text[start:safe_end].rstrip().rstrip(",") + "".join(reversed(safe_stack))
+    return _TRAILING_COMMA.sub(r"\1", repaired)
+
+
+def _parse_json(text: str) -> dict:
+    """
+    Parse Gemini output. JSON mode makes the direct parse the normal path.
+    """
+    try:
+        return json.loads(text)
+    except ValueError:
+        return json.loads(_repair_json(text))
+
+
+class GeminiUnavailable(RuntimeError):
+    """
+    Raised when Gemini is degraded (circuit open or retries exhausted).
+    """
+
+
+# Upstream errors worth retrying; anything else (bad request, auth) fails at once
+TRANSIENT_ERRORS = (
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    google_exceptions.GatewayTimeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive upstream failures and fails fast for
+    `cooldown` seconds, then lets a single trial request through (half-open).
+    """
+
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return "open"
+            return "half_open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def release_trial(self) -> None:
+        """
+        Give up a claimed trial without an outcome, so the next caller can try.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """
+    Long-lived Gemini wrapper: one model handle, a concurrency limit to stay
+    under quota, jittered exponential retries, optional hedged requests and a
+    circuit breaker.
+    """
+
+    def __init__(self, model_name: str):
+        self._model = genai.GenerativeModel(model_name)
+        self._limiter = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+        self._breaker = CircuitBreaker(
+            GEMINI_BREAKER_THRESHOLD, GEMINI_BREAKER_COOLDOWN_SECONDS
+        )
+        self._pool = ThreadPoolExecutor(
+            max_workers=GEMINI_MAX_CONCURRENCY * 2,
+            thread_name_prefix="gemini",
+        )
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "retries": 0,
+            "hedges": 0,
+            "failures": 0,
+            "parse_failures": 0,
+        }
+
+    # ---- single upstream call ----
+    def _call(self, contents: list, config: dict, timeout: float):
+        started = time.monotonic()
+        response = self._model.generate_content(
+            contents=contents,
+            generation_config=config,
+            request_options={"timeout": timeout},
+        )
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+            self._stats["calls"] += 1
+        return response
+
+    def _limited_call(self, contents: list, config: dict, timeout: float):
+        with self._limiter:
+            return self._call(contents, config, timeout)
+
+    def _hedge_call(self, contents: list, config: dict, timeout: float):
+        # Limiter slot was already taken by the caller
+        try:
+            return self._call(contents, config, timeout)
+        finally:
+            self._limiter.release()
+
+    def _hedge_delay(self) -> float:
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < 20:
+            return GEMINI_HEDGE_AFTER_SECONDS
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def _attempt(self, contents: list, config: dict, timeout: float):
+        if not GEMINI_HEDGE_ENABLED:
+            return self._limited_call(contents, config, timeout)
+
+        primary = self._pool.submit(self._limited_call, contents, config, timeout)
+        try:
+            return primary.result(timeout=self._hedge_delay())
+        except FutureTimeout:
+            pass
+
+        # Only hedge when there is spare quota
+        if not self._limiter.acquire(blocking=False):
+            return primary.result()
+
+        with self._lock:
+            self._stats["hedges"] += 1
+        hedge = self._pool.submit(self._hedge_call, contents, config, timeout)
+
+        done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+        first = done.pop()
+        if first.exception() is None:
+            return first.result()
+        return (hedge if first is primary else primary).result()
+
+    def _backoff(self, attempt: int) -> None:
+        cap = min(GEMINI_BACKOFF_MAX_SECONDS, GEMINI_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        time.sleep(random.uniform(0, cap))  # full jitter
+
+    def generate_json(
+        self,
+        contents: list,
+        schema: type[BaseModel],
+        timeout: float = GEMINI_TIMEOUT_SECONDS,
+    ) -> dict:
+        """
+        Generate content in native JSON mode constrained to `schema`, then
+        parse and validate it in one pass. Transient upstream errors and
+        unparseable output are retried.
+        """
+        config = {
+            "response_mime_type": "application/json",
+            "response_schema": _SCHEMAS[schema],
+        }
+        for attempt in range(GEMINI_MAX_RETRIES + 1):
+            if not self._breaker.allow():
+                raise GeminiUnavailable("Gemini circuit breaker is open")
+
+            try:
+                response = self._attempt(contents, config, timeout)
+            except TRANSIENT_ERRORS as exc:
+                self._breaker.record_failure()
+                with self._lock:
+                    self._stats["failures"] += 1
+                if attempt == GEMINI_MAX_RETRIES:
+                    raise GeminiUnavailable("Gemini request failed") from exc
+            except Exception:
+                # Non-transient (bad request, auth): upstream is reachable
+                self._breaker.record_success()
+                raise
+            else:
+                self._breaker.record_success()
+                try:
+                    parsed = _parse_json(response.text or "")
+                    return schema.model_validate(parsed).model_dump()
+                except ValueError:  # includes pydantic.ValidationError
+                    with self._lock:
+                        self._stats["parse_failures"] += 1
+                    if attempt == GEMINI_MAX_RETRIES:
+                        raise
+
+            with self._lock:
+                self._stats["retries"] += 1
+            self._backoff(attempt)
+
+    def stream_json(
+        self,
+        contents: list,
+        schema: type[BaseModel],
+        timeout: float = GEMINI_TIMEOUT_SECONDS,
+    ) -> Iterator[str]:
+        """
+        Streaming JSON-mode call that yields the accumulated text after every
+        chunk. There are no retries or hedges once output has started; the
+        caller parses and validates the final text.
+        """
+        config = {
+            "response_mime_type": "application/json",
+            "response_schema": _SCHEMAS[schema],
+        }
+        if not self._breaker.allow():
+            raise GeminiUnavailable("Gemini circuit breaker is open")
+
+        settled = False
+        with self._limiter:
+            started = time.monotonic()
+            text = ""
+            try:
+                response = self._model.generate_content(
+                    contents=contents,
+                    generation_config=config,
+                    request_options={"timeout": timeout},
+                    stream=True,
+                )
+                for chunk in response:
+                    if chunk.parts:
+                        text += chunk.text
+                        yield text
+            except TRANSIENT_ERRORS as exc:
+                settled = True
+                self._breaker.record_failure()
+                with self._lock:
+                    self._stats["failures"] += 1
+                raise GeminiUnavailable("Gemini request failed") from exc
+            except Exception:
+                settled = True
+                self._breaker.record_success()
+                raise
+            else:
+                settled = True
+                self._breaker.record_success()
+                with self._lock:
+                    self._latencies.append(time.monotonic() - started)
+                    self._stats["calls"] += 1
+            finally:
+                if not settled:
+                    # Consumer went away mid-stream (GeneratorExit); don't
+                    # leave a half-open trial claimed forever
+                    self._breaker.release_trial()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["circuit"] = self._breaker.state
+        stats["hedge_after_seconds"] = round(self._hedge_delay(), 2)
+        return stats
+
+
+_client = GeminiClient(MODEL)
+
+
+def _cache_key(image_bytes: bytes, cuisine_hint: Optional[str]) -> str:
+    hint = (cuisine_hint or "").strip().lower()
+    h = hashlib.sha256(image_bytes)
+    h.update(b"\0" + hint.encode("utf-8") + b"\0" + MODEL.encode("utf-8"))
+    h.update(b"\0" + _CACHE_VERSION.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    with _cache_lock:
+        analysis = _cache.get(key)
+        if analysis is not None:
+            _cache_stats["memory_hits"] += 1
+            return analysis
+
+    doc = analysis_cache_collection.find_one({"_id": key}, {"analysis": 1})
+    if not doc:
+        return None
+
+    with _cache_lock:
+        _cache[key] = doc["analysis"]
+        _cache_stats["db_hits"] += 1
+    return doc["analysis"]
+
+
+def _cache_put(key: str, analysis: Dict[str, Any]) -> None:
+    with _cache_lock:
+        _cache[key] = analysis
+
+    analysis_cache_collection.update_one(
+        {"_id": key},
+        {
+            "$set": {"analysis": analysis, "model": MODEL, "version": _CACHE_VERSION},
+            "$setOnInsert": {"created_at": datetime.utcnow()},
+        },
+        upsert=True,
+    )
+
+
+def cache_stats() -> Dict[str, Any]:
+    """
+    Hit/miss counters for the analysis cache, plus the estimated Gemini time saved.
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["memory_entries"] = len(_cache)
+
+    hits = stats["memory_hits"] + stats["db_hits"]
+    lookups = hits + stats["misses"]
+    avg_call = stats["gemini_seconds"] / stats["misses"] if stats["misses"] else 0.0
+
+    stats["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+    stats["gemini_calls_saved"] = hits
+    stats["est_seconds_saved"] = round(hits * avg_call, 1)
+    stats["gemini_seconds"] = round(stats["gemini_seconds"], 1)
+    return stats
+
+
+def client_stats() -> Dict[str, Any]:
+    """
+    Call/retry/hedge counters and circuit state of the shared Gemini client.
+    """
+    return _client.stats()
 
 
 def analyze_with_gemini(
-    image: Image.Image,
+    image_bytes: bytes,
     cuisine_hint: Optional[str] = None
 ) -> Dict[str, Any]:
     """
-    Analyze food image and return STRICT nutrition JSON.
+    Analyze a JPEG-encoded food image and return a validated MealAnalysis dict.
+    Identical images (same hint + model) are served from the analysis cache.
     """
-    buf = io.BytesIO()
-    image.save(buf, format="JPEG", quality=90)
-    buf.seek(0)
+    key = _cache_key(image_bytes, cuisine_hint)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    started = time.monotonic()
+    analysis = _call_gemini(image_bytes, cuisine_hint)
+
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+        _cache_stats["gemini_seconds"] += time.monotonic() - started
+
+    _cache_put(key, analysis)
+    return analysis
+
 
-    prompt = f"""
+def _image_part(image_bytes: bytes) -> Dict[str, Any]:
+    return {
+        "inline_data": {
+            "mime_type": "image/jpeg",
+            "data": image_bytes
+        }
+    }
+
+
+# Known foods get local macros, so the model only needs their name + weight
+_KNOWN_FOODS = ", ".join(nutrition_kb.names)
+
+_IDENTIFY_PROMPT = """
 You are a professional food nutrition analysis engine.
 
-Rules (VERY IMPORTANT):
-- Return ONLY valid JSON
-- DO NOT use markdown
-- DO NOT omit any field
-- Use EXACT field names
-
-Schema:
-
-{{
-"items": [
-{{
-"name": "string",
-"confidence": number,
-"estimated_weight_g": number,
-"nutrition_per_portion": {{
-        "calories": number,
-        "protein_g": number,
-        "carbs_g": number,
-        "fat_g": number,
-        "fiber_g": number,
-        "sugar_g": number,
-        "sodium_mg": number
-}}
-    }}
-],
-"total_nutrition": {{
-    "calories": number,
-    "protein_g": number,
-    "carbs_g": number,
-    "fat_g": number,
-    "fiber_g": number,
-    "sugar_g": number,
-    "sodium_mg": number
-}}
-}}
-
-Analyze the meal image and fill ALL fields.
-Cuisine hint: {cuisine_hint or "general"}.
+Identify ALL distinct food items in the meal image. For each item give its
+name, your confidence (0-1) and the estimated portion weight in grams.
+If an item is one of the known foods below, use that exact name and omit
+nutrition_per_portion; otherwise also give the nutrition for that portion.
+Known foods: {known_foods}.
+Cuisine hint: {cuisine_hint}.
 """
 
-    model = genai.GenerativeModel(MODEL)
-
-    response = model.generate_content(
-        contents=[
-            {
-                "role": "user",
-                "parts": [
-                    {"text": prompt},
-                    {
-                        "inline_data": {
-                            "mime_type": "image/jpeg",
-                            "data": buf.getvalue()
-                        }
-                    }
-                ],
-            }
-        ],
-        request_options={"timeout": 90},
+_BATCH_PROMPT = """
+You are a professional food nutrition analysis engine.
+You are given {count} separate meal images, labelled "Image 0" to "Image {last}".
+
+For EACH image return one result with its image_index and the items of that
+meal only (never mix items between images): every distinct food item with
+name, confidence (0-1) and estimated portion weight in grams.
+If an item is one of the known foods below, use that exact name and omit
+nutrition_per_portion; otherwise also give the nutrition for that portion.
+Known foods: {known_foods}.
+Cuisine hint: {cuisine_hint}.
+"""
+
+# Part of every cache key: editing a prompt, a schema or the KB table
+# must not keep serving analyses produced under the old ones
+_CACHE_VERSION = hashlib.sha256(
+    "\0".join([
+        _IDENTIFY_PROMPT,
+        _BATCH_PROMPT,
+        json.dumps(list(_SCHEMAS.values()), sort_keys=True),
+        json.dumps(MealAnalysis.model_json_schema(), sort_keys=True),
+        nutrition_kb.version,
+    ]).encode("utf-8")
+).hexdigest()[:16]
+
+
+def _finalize(identification: Dict[str, Any]) -> Dict[str, Any]:
+    return MealAnalysis.model_validate(build_analysis(identification)).model_dump()
+
+
+def _identify_contents(image_bytes: bytes, cuisine_hint: Optional[str]) -> list:
+    prompt = _IDENTIFY_PROMPT.format(
+        known_foods=_KNOWN_FOODS, cuisine_hint=cuisine_hint or "general"
     )
 
-    return _force_json(response.text or "")
+    return [
+        {
+            "role": "user",
+            "parts": [
+                {"text": prompt},
+                _image_part(image_bytes),
+            ],
+        }
+    ]
+
+
+def _call_gemini(
+    image_bytes: bytes,
+    cuisine_hint: Optional[str] = None
+) -> Dict[str, Any]:
+    identification = _client.generate_json(
+        _identify_contents(image_bytes, cuisine_hint),
+        MealIdentification,
+    )
+    return _finalize(identification)
+
+
+def stream_analysis(
+    image_bytes: bytes,
+    cuisine_hint: Optional[str] = None
+) -> Iterator[Tuple[str, Any]]:
+    """
+    Progressive analyze_with_gemini. Yields ("items", [...]) each time another
+    identified item is complete in the streamed output, then ("analysis", dict)
+    with the validated MealAnalysis (cached results skip straight to it).
+    """
+    key = _cache_key(image_bytes, cuisine_hint)
+    cached = _cache_get(key)
+    if cached is not None:
+        yield "analysis", cached
+        return
+
+    started = time.monotonic()
+    text, emitted = "", 0
+    for text in _client.stream_json(
+        _identify_contents(image_bytes, cuisine_hint), MealIdentification
+    ):
+        try:
+            items = _parse_json(text).get("items") or []
+        except ValueError:
+            continue  # nothing complete yet
+
+        # The last parsed item may still be cut off mid-stream
+        if len(items) - 1 > emitted:
+            emitted = len(items) - 1
+            yield "items", items[:emitted]
+
+    try:
+        identification = MealIdentification.model_validate(_parse_json(text)).model_dump()
+        analysis = _finalize(identification)
+    except ValueError:
+        # Streamed output was unusable; the buffered path retries
+        analysis = _call_gemini(image_bytes, cuisine_hint)
+
+    with _cache_lock:
+        _cache_stats["misses"] += 1
+        _cache_stats["gemini_seconds"] += time.monotonic() - started
+
+    _cache_put(key, analysis)
+    yield "analysis", analysis
+
+
+def _call_gemini_batch(
+    images: List[bytes],
+    cuisine_hint: Optional[str] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Analyze several meal images in ONE request; returns one result per image (None if missing).
+    """
+    prompt = _BATCH_PROMPT.format(
+        count=len(images),
+        last=len(images) - 1,
+        known_foods=_KNOWN_FOODS,
+        cuisine_hint=cuisine_hint or "general",
+    )
+
+    parts = [{"text": prompt}]
+    for idx, image_bytes in enumerate(images):
+        parts.append({"text": f"Image {idx}:"})
+        parts.append(_image_part(image_bytes))
+
+    packed = _client.generate_json(
+        [{"role": "user", "parts": parts}],
+        PackedMealAnalysis,
+        timeout=GEMINI_TIMEOUT_SECONDS + 30 * (len(images) - 1),
+    )
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(images)
+    for entry in packed["results"]:
+        idx = entry["image_index"]
+        if 0 <= idx < len(images):
+            results[idx] = _finalize(entry["analysis"])
+
+    return results
+
+
+def analyze_batch_with_gemini(
+    images: List[bytes],
+    cuisine_hint: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Analyze several JPEG-encoded images, packing cache misses into a single request.
+    Images the packed response leaves out fall back to a single-image call.
+    """
+    keys = [_cache_key(image_bytes, cuisine_hint) for image_bytes in images]
+    results = [_cache_get(key) for key in keys]
+    pending = [idx for idx, result in enumerate(results) if result is None]
+    if not pending:
+        return results
+
+    started = time.monotonic()
+    packed = _call_gemini_batch([images[idx] for idx in pending], cuisine_hint)
+
+    with _cache_lock:
+        _cache_stats["misses"] += sum(1 for analysis in packed if analysis is not None)
+        _cache_stats["gemini_seconds"] += time.monotonic() - started
+
+    for idx, analysis in zip(pending, packed):
+        if analysis is None:
+            results[idx] = analyze_with_gemini(images[idx], cuisine_hint)
+            continue
+        _cache_put(keys[idx], analysis)
+        results[idx] = analysis
+
+    return results
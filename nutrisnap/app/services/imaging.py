@@ -0,0 +1,32 @@
+import io
+from typing import BinaryIO, NamedTuple, Union
+
+from PIL import Image, ImageOps
+
+from app.core.config import IMAGE_MAX_DIMENSION, IMAGE_JPEG_QUALITY
+
+
+class PreparedImage(NamedTuple):
+    image: Image.Image  # orientation-fixed, downscaled RGB
+    jpeg: bytes         # single encode shared by Gemini and Cloudinary
+
+
+def prepare_image(source: Union[bytes, BinaryIO]) -> PreparedImage:
+    """
+    Decode an uploaded photo once: fix EXIF orientation, bound its size and encode to JPEG.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    img = Image.open(source)
+
+    # Let the JPEG decoder downscale by 1/2, 1/4 or 1/8 while decoding
+    img.draft("RGB", (IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION))
+    img = ImageOps.exif_transpose(img)
+    img = img.convert("RGB")
+    img.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=IMAGE_JPEG_QUALITY)
+
+    return PreparedImage(image=img, jpeg=buf.getvalue())
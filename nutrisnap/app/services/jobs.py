@@ -0,0 +1,208 @@
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+
+from bson import Binary, ObjectId
+from pymongo import ReturnDocument
+
+from app.core.config import (
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    GEMINI_TIMEOUT_SECONDS,
+    GEMINI_MAX_RETRIES,
+    GEMINI_BACKOFF_MAX_SECONDS,
+)
+from app.db.mongo import jobs_collection
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Upload, pHash lookup and the Mongo writes around the Gemini call
+PIPELINE_SLACK_SECONDS = 30
+
+
+def worst_case_analysis_seconds() -> float:
+    """
+    Longest a single analyze_meal can run: every Gemini attempt times out and
+    every backoff is maxed.
+    """
+    return (
+        (GEMINI_MAX_RETRIES + 1) * GEMINI_TIMEOUT_SECONDS
+        + GEMINI_MAX_RETRIES * GEMINI_BACKOFF_MAX_SECONDS
+        + PIPELINE_SLACK_SECONDS
+    )
+
+
+def enqueue_job(
+    image_bytes: bytes,
+    cuisine_hint: Optional[str],
+    user_id: str,
+    email: str,
+) -> str:
+    """
+    Persist an analysis job (with the preprocessed JPEG) and return its id.
+    """
+    now = datetime.utcnow()
+    result = jobs_collection.insert_one({
+        "status": QUEUED,
+        "user_id": user_id,
+        "email": email,
+        "cuisine_hint": cuisine_hint,
+        "image": Binary(image_bytes),
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    })
+    return str(result.inserted_id)
+
+
+def expire_jobs(now: Optional[datetime] = None) -> int:
+    """
+    Fail running jobs whose lease ran out with no attempts left (the worker
+    died on its last try), so they don't stay `running` forever.
+    """
+    now = now or datetime.utcnow()
+    result = jobs_collection.update_many(
+        {
+            "status": RUNNING,
+            "lease_until": {"$lt": now},
+            "attempts": {"$gte": JOB_MAX_ATTEMPTS},
+        },
+        {
+            "$set": {
+                "status": FAILED,
+                "error": "Worker lease expired on the final attempt",
+                "updated_at": now,
+            },
+            "$unset": {"image": "", "lease_until": ""},
+        },
+    )
+    return result.modified_count
+
+
+def claim_job(worker_id: str) -> Optional[dict]:
+    """
+    Atomically take the oldest queued job, or one whose worker's lease expired.
+    """
+    now = datetime.utcnow()
+    expire_jobs(now)
+    return jobs_collection.find_one_and_update(
+        {
+            "$or": [
+                {"status": QUEUED},
+                {"status": RUNNING, "lease_until": {"$lt": now}},
+            ],
+            "attempts": {"$lt": JOB_MAX_ATTEMPTS},
+        },
+        {
+            "$set": {
+                "status": RUNNING,
+                "worker": worker_id,
+                "lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def _leased(job_id: ObjectId, worker_id: str) -> dict:
+    # Only the worker currently holding the lease may move the job on
+    return {"_id": job_id, "worker": worker_id, "status": RUNNING}
+
+
+def renew_lease(job_id: ObjectId, worker_id: str) -> bool:
+    """
+    Extend the lease if this worker still holds it. Returns False if the job
+    was reclaimed, in which case the caller must drop its result.
+    """
+    now = datetime.utcnow()
+    result = jobs_collection.update_one(
+        _leased(job_id, worker_id),
+        {"$set": {"lease_until": now + timedelta(seconds=JOB_LEASE_SECONDS), "updated_at": now}},
+    )
+    return result.matched_count == 1
+
+
+@contextmanager
+def lease_heartbeat(
+    job_id: ObjectId,
+    worker_id: str,
+    interval: float = JOB_LEASE_SECONDS / 3,
+) -> Iterator[threading.Event]:
+    """
+    Keep renewing the job's lease from a background thread while the body runs.
+    Yields an Event that is set once the lease was lost to another worker.
+    """
+    lost, stop = threading.Event(), threading.Event()
+
+    def beat():
+        while not stop.wait(interval):
+            try:
+                if not renew_lease(job_id, worker_id):
+                    lost.set()
+                    return
+            except Exception:
+                # Transient Mongo error: the lease still has time, try next beat
+                logger.exception("job %s lease renewal failed", job_id)
+
+    thread = threading.Thread(target=beat, name=f"lease-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield lost
+    finally:
+        stop.set()
+        thread.join()
+
+
+def complete_job(job_id: ObjectId, worker_id: str, result: dict) -> bool:
+    update = jobs_collection.update_one(
+        _leased(job_id, worker_id),
+        {
+            "$set": {"status": DONE, "result": result, "updated_at": datetime.utcnow()},
+            "$unset": {"image": "", "lease_until": ""},
+        },
+    )
+    return update.matched_count == 1
+
+
+def fail_job(job_id: ObjectId, worker_id: str, error: str, attempts: int) -> bool:
+    """
+    Requeue the job for another attempt, or mark it failed once attempts run out.
+    """
+    final = attempts >= JOB_MAX_ATTEMPTS
+    update = {
+        "$set": {
+            "status": FAILED if final else QUEUED,
+            "error": error,
+            "updated_at": datetime.utcnow(),
+        },
+        "$unset": {"lease_until": ""},
+    }
+    if final:
+        update["$unset"]["image"] = ""
+    result = jobs_collection.update_one(_leased(job_id, worker_id), update)
+    return result.matched_count == 1
+
+
+def get_job(job_id: str, user_id: str) -> Optional[dict]:
+    if not ObjectId.is_valid(job_id):
+        return None
+
+    job = jobs_collection.find_one(
+        {"_id": ObjectId(job_id), "user_id": user_id},
+        {"status": 1, "result": 1, "error": 1, "created_at": 1, "updated_at": 1},
+    )
+    if not job:
+        return None
+
+    job["job_id"] = str(job.pop("_id"))
+    for key in ("created_at", "updated_at"):
+        if key in job:
+            job[key] = job[key].isoformat()
+    return job
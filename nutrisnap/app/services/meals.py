@@ -0,0 +1,103 @@
+import io
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId
+from fastapi import HTTPException
+from PIL import Image
+
+from app.db.meals import insert_meal_sync
+from app.services.cloudinary import delete_image, upload_image
+from app.services.gemini import analyze_with_gemini, GeminiUnavailable
+from app.services.phash import find_similar_analysis, phash_index
+from app.utils.concurrency import upstream_executor
+
+logger = logging.getLogger(__name__)
+
+
+def error_detail(exc: BaseException) -> str:
+    """
+    Client-facing message for a failed analysis; never the exception's own text.
+    """
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    if isinstance(exc, GeminiUnavailable):
+        return "Analysis service temporarily unavailable"
+    return "Analysis failed"
+
+
+def build_meal_doc(
+    user_id: str,
+    email: str,
+    image_url: str,
+    analysis: dict,
+    phash: str,
+    cuisine_hint: Optional[str] = None,
+) -> dict:
+    return {
+        "user_id": user_id,
+        "email": email,
+        "image_url": image_url,
+        "analysis": analysis,
+        "phash": phash,
+        "cuisine_hint": cuisine_hint,
+        "timestamp": datetime.utcnow(),
+    }
+
+
+def _discard_upload(future) -> None:
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        delete_image(future.result())
+    except Exception:
+        logger.exception("failed to delete orphaned upload")
+
+
+def analyze_meal(
+    image_bytes: bytes,
+    cuisine_hint: Optional[str],
+    user_id: str,
+    email: str,
+    meal_id: Optional[ObjectId] = None,
+) -> Tuple[dict, dict]:
+    """
+    Blocking analyze pipeline for background workers: upload and analysis in
+    parallel. Returns (meal doc to store, response in the /analyze shape);
+    nothing is persisted yet.
+    """
+    upload_future = upstream_executor.submit(upload_image, image_bytes)
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        image.load()
+        phash, cached_analysis = find_similar_analysis(image, user_id, cuisine_hint)
+
+        if cached_analysis is not None:
+            analysis = cached_analysis
+        else:
+            analysis = analyze_with_gemini(image_bytes, cuisine_hint)
+    except BaseException:
+        # No meal will reference the upload; delete it once it lands
+        upload_future.add_done_callback(_discard_upload)
+        raise
+
+    image_url = upload_future.result()
+
+    meal = build_meal_doc(user_id, email, image_url, analysis, phash, cuisine_hint)
+    meal["_id"] = meal_id or ObjectId()
+
+    return meal, {
+        "meal_id": str(meal["_id"]),
+        "analysis": analysis,
+        "image_url": image_url,
+        "cached": cached_analysis is not None,
+    }
+
+
+def store_meal(meal: dict) -> None:
+    insert_meal_sync(meal)
+    phash_index.add(
+        int(meal["phash"], 16), meal["_id"], meal["user_id"], meal["cuisine_hint"]
+    )
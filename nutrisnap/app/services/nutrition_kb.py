@@ -0,0 +1,131 @@
+import csv
+import hashlib
+import re
+from array import array
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.core.config import NUTRITION_KB_PATH, NUTRITION_KB_MATCH_THRESHOLD
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat", "fiber", "sugar", "sodium")
+
+_DEFAULT_PATH = Path(__file__).resolve().parent.parent / "data" / "nutrition_per_100g.csv"
+_NON_WORD = re.compile(r"[^a-z0-9 ]+")
+
+
+def _normalize(name: str) -> str:
+    name = _NON_WORD.sub(" ", name.lower())
+    words = [w[:-1] if len(w) > 3 and w.endswith("s") else w for w in name.split()]
+    return " ".join(words)
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NutritionKB:
+    """
+    Per-100g nutrition table in flat float arrays, with exact + trigram fuzzy name lookup.
+    """
+
+    def __init__(self, path: Path):
+        self.names: List[str] = []
+        self._values = array("f")         # row-major, len(NUTRIENTS) floats per row
+        self._keys: List[str] = []        # normalized names + aliases
+        self._key_rows = array("I")       # key index -> row
+        self._exact: Dict[str, int] = {}
+        self._index = defaultdict(lambda: array("I"))  # trigram -> key indexes
+        self.version = hashlib.sha256(Path(path).read_bytes()).hexdigest()[:16]
+
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                idx = len(self.names)
+                self.names.append(row["name"])
+                self._values.extend(float(row[n]) for n in NUTRIENTS)
+
+                aliases = [a for a in (row.get("aliases") or "").split("|") if a]
+                for alias in [row["name"], *aliases]:
+                    self._add_key(_normalize(alias), idx)
+
+    def _add_key(self, key: str, row: int) -> None:
+        if not key or key in self._exact:
+            return
+        self._exact[key] = row
+        key_idx = len(self._keys)
+        self._keys.append(key)
+        self._key_rows.append(row)
+        for gram in _trigrams(key):
+            self._index[gram].append(key_idx)
+
+    def match(self, name: str) -> Optional[int]:
+        """
+        Row of the best matching food, or None below the confidence threshold.
+
+        Names and aliases match exactly (after normalization). Fuzzy matching
+        only corrects spelling: the candidate must have the same number of
+        words, so "egg fried rice" never borrows the macros of "fried rice".
+        """
+        key = _normalize(name or "")
+        if not key:
+            return None
+        if key in self._exact:
+            return self._exact[key]
+
+        grams = _trigrams(key)
+        common = defaultdict(int)
+        for gram in grams:
+            for key_idx in self._index.get(gram, ()):
+                common[key_idx] += 1
+
+        words = key.count(" ")
+        best_row, best_score = None, 0.0
+        for key_idx, shared in common.items():
+            if self._keys[key_idx].count(" ") != words:
+                continue
+            other = len(self._keys[key_idx]) + 1  # trigram count of a padded key
+            score = shared / (len(grams) + other - shared)
+            if score > best_score:
+                best_row, best_score = self._key_rows[key_idx], score
+
+        return best_row if best_score >= NUTRITION_KB_MATCH_THRESHOLD else None
+
+    def per_portion(self, row: int, grams: float) -> Dict[str, float]:
+        base = row * len(NUTRIENTS)
+        factor = grams / 100.0
+        return {
+            nutrient: round(self._values[base + i] * factor, 1)
+            for i, nutrient in enumerate(NUTRIENTS)
+        }
+
+
+nutrition_kb = NutritionKB(Path(NUTRITION_KB_PATH) if NUTRITION_KB_PATH else _DEFAULT_PATH)
+
+
+def build_analysis(identification: dict) -> dict:
+    """
+    Turn identified items (+ optional model nutrition) into a MealAnalysis dict.
+    Known foods get local per-gram macros; totals are always summed here.
+    """
+    items = []
+    totals = dict.fromkeys(NUTRIENTS, 0.0)
+
+    for item in identification.get("items", []):
+        row = nutrition_kb.match(item["name"])
+        if row is not None:
+            nutrition = nutrition_kb.per_portion(row, item["estimated_weight_g"])
+            source = "kb"
+        else:
+            nutrition = item.get("nutrition_per_portion") or dict.fromkeys(NUTRIENTS, 0.0)
+            source = "model"
+
+        for nutrient in NUTRIENTS:
+            totals[nutrient] += nutrition.get(nutrient, 0)
+
+        items.append({**item, "nutrition_per_portion": nutrition, "source": source})
+
+    return {
+        "items": items,
+        "total_nutrition": {n: round(v, 1) for n, v in totals.items()},
+    }
@@ -0,0 +1,212 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import PHASH_MAX_DISTANCE, PHASH_REFRESH_SECONDS
+from app.db.meals import get_meal_analysis_sync
+from app.db.mongo import meals_collection
+
+
+def dhash(image: Image.Image, size: int = 8) -> int:
+    """
+    64-bit difference hash: robust to re-encoding, small crops and exposure changes.
+    """
+    gray = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance.
+    Lookups within a small radius only visit a tiny fraction of the nodes.
+    """
+
+    def __init__(self):
+        self._root = None
+        self.size = 0
+
+    def add(self, h: int, value) -> None:
+        if self._root is None:
+            self._root = [h, value, {}]
+            self.size = 1
+            return
+
+        node = self._root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1] = value  # keep the most recent meal for this hash
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, value, {}]
+                self.size += 1
+                return
+            node = child
+
+    def nearest(self, h: int, max_distance: int, skip=frozenset()):
+        """
+        Return (distance, value) of the closest hash within max_distance, or None.
+        Values in `skip` are passed over.
+        """
+        if self._root is None:
+            return None
+
+        best = None
+        radius = max_distance
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius and node[1] not in skip:
+                best = (d, node[1])
+                radius = d - 1
+                if d == 0:
+                    break
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+
+        return best
+
+
+def phash_scope(user_id: str, cuisine_hint: Optional[str]) -> Tuple[str, str]:
+    """
+    Analyses are only reused within one user's meals with the same cuisine hint.
+    """
+    return user_id, (cuisine_hint or "").strip().lower()
+
+
+# Re-read this far back on every refresh: covers inserts that committed late
+# and clock skew between the processes stamping indexed_at
+REFRESH_OVERLAP = timedelta(minutes=2)
+
+
+class PHashIndex:
+    """
+    In-process near-duplicate index over stored meal images, one BK-tree per
+    (user, cuisine hint) scope.
+    Loaded from Mongo in the background and topped up incrementally by the
+    meals' indexed_at (stamped at store time; _ids come from job creation and
+    other processes, so they aren't ordered by insertion).
+    """
+
+    def __init__(self):
+        self._trees: Dict[Tuple[str, str], BKTree] = {}
+        self._removed = set()  # deleted meals still in a tree
+        self._lock = threading.Lock()
+        self._since: Optional[datetime] = None
+        self._last_refresh = 0.0
+        self._refreshing = False
+
+    def _add(self, h: int, meal_id, scope: Tuple[str, str]) -> None:
+        # Caller holds the lock
+        tree = self._trees.get(scope)
+        if tree is None:
+            tree = self._trees[scope] = BKTree()
+        tree.add(h, meal_id)
+
+    def _refresh(self) -> None:
+        try:
+            started = datetime.utcnow()
+            query = {"phash": {"$exists": True}}
+            if self._since is not None:
+                query["indexed_at"] = {"$gte": self._since}
+
+            cursor = meals_collection.find(
+                query, {"phash": 1, "user_id": 1, "cuisine_hint": 1}
+            ).batch_size(10_000)
+            for doc in cursor:
+                scope = phash_scope(doc.get("user_id", ""), doc.get("cuisine_hint"))
+                with self._lock:
+                    # Re-adding a meal seen last time is a no-op
+                    self._add(int(doc["phash"], 16), doc["_id"], scope)
+
+            self._since = started - REFRESH_OVERLAP
+        finally:
+            with self._lock:
+                self._last_refresh = time.monotonic()
+                self._refreshing = False
+
+    def _maybe_refresh(self) -> None:
+        with self._lock:
+            stale = time.monotonic() - self._last_refresh > PHASH_REFRESH_SECONDS
+            if self._refreshing or not stale:
+                return
+            self._refreshing = True
+
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def lookup(
+        self,
+        h: int,
+        user_id: str,
+        cuisine_hint: Optional[str],
+        max_distance: int = PHASH_MAX_DISTANCE,
+    ):
+        """
+        Return the _id of the most similar stored meal in scope, or None.
+        """
+        self._maybe_refresh()
+        with self._lock:
+            tree = self._trees.get(phash_scope(user_id, cuisine_hint))
+            match = tree.nearest(h, max_distance, self._removed) if tree else None
+        return match[1] if match else None
+
+    def remove(self, meal_id) -> None:
+        """
+        Stop returning a deleted meal (BK-tree nodes stay, they're skipped).
+        """
+        with self._lock:
+            self._removed.add(meal_id)
+
+    def add(self, h: int, meal_id, user_id: str, cuisine_hint: Optional[str]) -> None:
+        scope = phash_scope(user_id, cuisine_hint)
+        with self._lock:
+            self._add(h, meal_id, scope)
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(tree.size for tree in self._trees.values())
+
+
+phash_index = PHashIndex()
+
+# Near-duplicates tried before giving up when matches turn out to be deleted
+LOOKUP_ATTEMPTS = 3
+
+
+def find_similar_analysis(
+    image: Image.Image,
+    user_id: str,
+    cuisine_hint: Optional[str] = None,
+) -> tuple[str, Optional[dict]]:
+    """
+    Hash the image and return (hex hash, analysis of a near-duplicate meal of
+    the same user and cuisine hint, or None).
+    """
+    h = dhash(image)
+
+    analysis = None
+    for _ in range(LOOKUP_ATTEMPTS):
+        meal_id = phash_index.lookup(h, user_id, cuisine_hint)
+        if meal_id is None:
+            break
+        analysis = get_meal_analysis_sync(meal_id)
+        if analysis is not None:
+            break
+        # Deleted, possibly through another process: skip it and look again
+        phash_index.remove(meal_id)
+
+    return f"{h:016x}", analysis
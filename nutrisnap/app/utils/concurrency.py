@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Iterator
+
+from app.core.config import BLOCKING_IO_WORKERS, UPSTREAM_IO_WORKERS
+
+# Bounded pool for short blocking calls (PyMongo, image decoding)
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_IO_WORKERS,
+    thread_name_prefix="nutrisnap-io",
+)
+
+# Gemini and Cloudinary calls, which can hold a thread for minutes
+upstream_executor = ThreadPoolExecutor(
+    max_workers=UPSTREAM_IO_WORKERS,
+    thread_name_prefix="nutrisnap-upstream",
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a blocking callable on the bounded executor without stalling the event loop.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        blocking_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_upstream(func, *args, **kwargs):
+    """
+    run_blocking for Gemini / Cloudinary calls, on their own executor.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        upstream_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+_DONE = object()
+
+
+async def iterate_blocking(gen_func: Callable[..., Iterator], *args, **kwargs) -> AsyncIterator:
+    """
+    Drive a blocking generator on the executor and re-yield its items on the
+    event loop as they are produced. Exceptions raised by the generator are
+    re-raised here; if the consumer stops early the generator is closed.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def pump():
+        gen = gen_func(*args, **kwargs)
+        try:
+            for item in gen:
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+                if stop.is_set():
+                    break
+        except BaseException as exc:
+            loop.call_soon_threadsafe(queue.put_nowait, (_DONE, exc))
+            return
+        finally:
+            gen.close()
+        loop.call_soon_threadsafe(queue.put_nowait, (_DONE, None))
+
+    # Only used for upstream streams (Gemini), which run as long as a call
+    loop.run_in_executor(upstream_executor, pump)
+    try:
+        while True:
+            item, exc = await queue.get()
+            if item is _DONE:
+                if exc is not None:
+                    raise exc
+                break
+            yield item
+    finally:
+        # The pump notices on its next item and closes the generator
+        stop.set()
@@ -1,23 +1,31 @@
+import base64
 import json
-from bson import ObjectId, json_util
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
 
 
-def convert_objectid(data):
+def encode_cursor(created_at, _id) -> str:
     """
-    Recursively convert MongoDB ObjectId to string
+    Opaque keyset cursor for the (created_at, _id) sort
     """
-    if isinstance(data, list):
-        return [convert_objectid(item) for item in data]
-    elif isinstance(data, dict):
-        return {key: convert_objectid(value) for key, value in data.items()}
-    elif isinstance(data, ObjectId):
-        return str(data)
-    else:
-        return data
+    if isinstance(created_at, datetime):
+        created_at = {"d": created_at.isoformat()}
+    raw = json.dumps({"t": created_at, "i": str(_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
 
 
-def safe_json(data):
+def decode_cursor(cursor: str):
     """
-    Safely serialize MongoDB documents to JSON
+    Inverse of encode_cursor; raises ValueError on anything malformed
     """
-    return json.loads(json_util.dumps(data))
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = data["t"]
+        if isinstance(created_at, dict):
+            # Native datetime sort key (legacy ISO-string posts stay strings)
+            created_at = datetime.fromisoformat(created_at["d"])
+        return created_at, ObjectId(data["i"])
+    except (ValueError, TypeError, KeyError, InvalidId) as exc:
+        raise ValueError("Invalid cursor") from exc
@@ -0,0 +1,60 @@
+import json
+from datetime import date, datetime, timezone
+from typing import Any
+
+from bson import Binary, Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json fallback
+    orjson = None
+
+
+def bson_default(value: Any):
+    """
+    Encode the BSON types PyMongo hands back. Naive datetimes are UTC (that's
+    how they're stored), so they get an explicit offset.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Binary):
+        return None
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        # orjson handles datetime itself; OPT_NAIVE_UTC keeps the output consistent
+        return orjson.dumps(
+            content,
+            default=bson_default,
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS,
+        )
+    return json.dumps(
+        content,
+        default=bson_default,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class MongoJSONResponse(JSONResponse):
+    """
+    Single-pass JSON response that understands ObjectId/datetime.
+
+    Used as the app's default response class. Handlers returning raw Mongo
+    documents should return an instance directly, which also skips FastAPI's
+    jsonable_encoder walk over the payload.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
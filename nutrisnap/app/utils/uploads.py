@@ -0,0 +1,113 @@
+from typing import BinaryIO, Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from PIL import Image, UnidentifiedImageError
+
+from app.core.config import MAX_UPLOAD_BYTES
+from app.services.imaging import PreparedImage, prepare_image
+from app.utils.concurrency import run_blocking
+
+CHUNK_SIZE = 64 * 1024
+
+
+def sniff_image_format(header: bytes) -> Optional[str]:
+    """
+    Detect the real image format from magic bytes (never trust the client header).
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if header.startswith(b"BM"):
+        return "bmp"
+    return None
+
+
+async def _upload_size(upload: UploadFile) -> int:
+    """
+    Size of the spooled upload, counted chunk by chunk (nothing is kept in memory).
+    """
+    if upload.size is not None:
+        return upload.size
+
+    total = 0
+    await upload.seek(0)
+    while chunk := await upload.read(CHUNK_SIZE):
+        total += len(chunk)
+        if total > MAX_UPLOAD_BYTES:
+            break
+    return total
+
+
+async def open_image_upload(upload: UploadFile) -> BinaryIO:
+    """
+    Enforce the byte cap and sniff the format, then hand back the spooled file
+    positioned at 0 so it can be decoded without another full copy.
+    """
+    if await _upload_size(upload) > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Image too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)",
+        )
+
+    await upload.seek(0)
+    header = await upload.read(16)
+    if sniff_image_format(header) is None:
+        raise HTTPException(status_code=400, detail="Only image files are allowed")
+
+    await upload.seek(0)
+    return upload.file
+
+
+async def load_image_upload(upload: UploadFile) -> PreparedImage:
+    """
+    Validate an uploaded image and run the preprocessing stage off the event loop.
+    """
+    source = await open_image_upload(upload)
+    try:
+        return await run_blocking(prepare_image, source)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise HTTPException(status_code=400, detail="Could not decode image")
+
+
+class RequestSizeLimit:
+    """
+    ASGI middleware capping request bodies: rejects an oversized Content-Length
+    up front and counts streamed bytes, so chunked bodies without a
+    Content-Length are cut off at the same limit.
+    """
+
+    def __init__(self, app, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        too_large = JSONResponse(status_code=413, content={"detail": "Request body too large"})
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > limit:
+            return await too_large(scope, receive, send)
+
+        received = 0
+
+        async def counted_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Re-raised by FastAPI's body parsing, rendered as a 413
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, counted_receive, send)
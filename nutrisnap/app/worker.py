@@ -0,0 +1,118 @@
+"""
+Analysis job worker pool.
+
+    python -m app.worker --processes 4
+
+Each process polls the Mongo-backed job queue, runs the analyze pipeline and
+stores the result on the job document. Add processes (or machines) to scale
+throughput independently of the API workers.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+from app.core.config import JOB_WORKER_PROCESSES, JOB_POLL_SECONDS, JOB_LEASE_SECONDS
+
+logger = logging.getLogger("nutrisnap.worker")
+
+# Backoff after an unexpected error outside a job (e.g. Mongo unreachable)
+ERROR_BACKOFF_MAX_SECONDS = 30
+
+
+def run_job(job: dict, worker_id: str) -> None:
+    from pymongo.errors import DuplicateKeyError
+
+    from app.services.cloudinary import delete_image
+    from app.services.jobs import lease_heartbeat, renew_lease, complete_job, fail_job
+    from app.services.meals import analyze_meal, store_meal, error_detail
+
+    try:
+        # The lease is renewed in the background for as long as the analysis runs
+        with lease_heartbeat(job["_id"], worker_id) as lost:
+            # The meal reuses the job's _id, so a result can be stored once only
+            meal, result = analyze_meal(
+                bytes(job["image"]),
+                job.get("cuisine_hint"),
+                job["user_id"],
+                job["email"],
+                meal_id=job["_id"],
+            )
+
+        if lost.is_set() or not renew_lease(job["_id"], worker_id):
+            logger.warning("job %s was reclaimed; dropping result", job["_id"])
+            delete_image(meal["image_url"])
+            return
+
+        try:
+            store_meal(meal)
+        except DuplicateKeyError:
+            logger.info("job %s meal already stored", job["_id"])
+    except Exception as exc:
+        logger.exception("job %s failed", job["_id"])
+        fail_job(job["_id"], worker_id, error_detail(exc), job["attempts"])
+    else:
+        if not complete_job(job["_id"], worker_id, result):
+            logger.warning("job %s lease lost before completion", job["_id"])
+
+
+def worker_loop() -> None:
+    # Imported here so every spawned process opens its own Mongo client
+    from app.services.jobs import claim_job
+
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("worker %s started", worker_id)
+
+    errors = 0
+    while True:
+        try:
+            job = claim_job(worker_id)
+            if job:
+                run_job(job, worker_id)
+            errors = 0
+        except Exception:
+            # A dead worker stalls the queue silently; log, back off, carry on
+            errors += 1
+            delay = min(JOB_POLL_SECONDS * 2 ** errors, ERROR_BACKOFF_MAX_SECONDS)
+            logger.exception("worker %s loop error; retrying in %.0fs", worker_id, delay)
+            time.sleep(delay)
+            continue
+
+        if not job:
+            time.sleep(JOB_POLL_SECONDS)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run NutriSnap analysis workers")
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+
+    from app.services.jobs import worst_case_analysis_seconds
+    worst_case = worst_case_analysis_seconds()
+    if JOB_LEASE_SECONDS <= worst_case:
+        # A live job would be reclaimed (and expired on its last attempt) mid-run
+        sys.exit(
+            f"JOB_LEASE_SECONDS={JOB_LEASE_SECONDS} must exceed the worst-case "
+            f"analysis time of {worst_case:.0f}s (Gemini retries x timeout + backoff)"
+        )
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = [ctx.Process(target=worker_loop, daemon=True) for _ in range(args.processes)]
+    for proc in procs:
+        proc.start()
+
+    try:
+        for proc in procs:
+            proc.join()
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
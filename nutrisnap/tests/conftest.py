@@ -0,0 +1,15 @@
+import os
+
+# app.core.config refuses to import without these; nothing here talks to the
+# real services (Mongo clients connect lazily).
+for name, value in {
+    "GOOGLE_API_KEY": "test",
+    "MONGO_URI": "mongodb://localhost:27017",
+    "SECRET_KEY": "test-secret",
+    "CLOUDINARY_CLOUD_NAME": "test",
+    "CLOUDINARY_API_KEY": "test",
+    "CLOUDINARY_API_SECRET": "test",
+    "MONGO_ENSURE_INDEXES": "false",
+    "MONGO_VERIFY_QUERY_PLANS": "false",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,31 @@
+import asyncio
+
+from app.services import cloudinary
+
+
+def test_discard_upload_deletes_the_image_once_uploaded(monkeypatch):
+    deleted = []
+    monkeypatch.setattr(cloudinary, "delete_image", deleted.append)
+
+    async def scenario():
+        upload = asyncio.get_running_loop().create_future()
+        failed = asyncio.get_running_loop().create_future()
+        cloudinary.discard_upload(upload)
+        cloudinary.discard_upload(failed)
+
+        upload.set_result("https://res.cloudinary.com/x/image/upload/v1/nutrisnap_meals/a.jpg")
+        failed.set_exception(ConnectionError("upload failed"))
+        for _ in range(10):
+            await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert deleted == ["https://res.cloudinary.com/x/image/upload/v1/nutrisnap_meals/a.jpg"]
+
+
+def test_public_id_is_derived_from_the_secure_url(monkeypatch):
+    destroyed = []
+    monkeypatch.setattr(
+        cloudinary.cloudinary.uploader, "destroy", lambda public_id, **kw: destroyed.append(public_id)
+    )
+    cloudinary.delete_image("https://res.cloudinary.com/x/image/upload/v1712345678/nutrisnap_meals/abc123.jpg")
+    assert destroyed == ["nutrisnap_meals/abc123"]
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from app.db.community import POST_SORT, _after
+from app.utils.helpers import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize(
+    "created_at",
+    [datetime(2024, 5, 1, 12, 30, 15, 250000), "2023-01-02T03:04:05.123456"],
+)
+def test_cursor_round_trip(created_at):
+    _id = ObjectId()
+    assert decode_cursor(encode_cursor(created_at, _id)) == (created_at, _id)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", encode_cursor("x", "bad-id")])
+def test_malformed_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_keyset_pages_cross_from_dates_to_legacy_strings():
+    posts = mongomock.MongoClient().db.posts
+    posts.insert_many([
+        {"created_at": datetime(2024, 3, 1)},
+        {"created_at": datetime(2024, 2, 1)},
+        {"created_at": "2023-12-01T00:00:00"},
+        {"created_at": "2023-11-01T00:00:00"},
+    ])
+
+    seen, after = [], None
+    while True:
+        query = _after(after, descending=True) if after else {}
+        page = list(posts.find(query).sort(POST_SORT).limit(1))
+        if not page:
+            break
+        seen.append(page[0]["created_at"])
+        after = decode_cursor(encode_cursor(page[0]["created_at"], page[0]["_id"]))
+
+    assert len(seen) == 4
+
+
+def test_ascending_keyset_moves_from_strings_to_dates():
+    clause = _after(("2023-11-01T00:00:00", ObjectId()), descending=False)
+    assert {"created_at": {"$type": "date"}} in clause["$or"]
+
+    clause = _after((datetime(2024, 1, 1), ObjectId()), descending=False)
+    assert all("$type" not in str(c) for c in clause["$or"])
@@ -0,0 +1,66 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+from bson import ObjectId
+
+from app.services.export import EXPORT_COLUMNS, export_stream, flatten_meal
+
+MEAL_ID = ObjectId()
+MEAL = {
+    "_id": MEAL_ID,
+    "timestamp": datetime(2024, 5, 1, 12, 30),
+    "image_url": "https://img/1.jpg",
+    "analysis": {
+        "items_count": 2,
+        "total_nutrition": {"calories": 540.5, "protein": 20, "sodium": 800},
+    },
+}
+
+
+def _export(meals, fmt, compress=False) -> bytes:
+    async def source():
+        for meal in meals:
+            yield meal
+
+    async def collect():
+        return b"".join([chunk async for chunk in export_stream(source(), fmt, compress)])
+
+    return asyncio.run(collect())
+
+
+def test_flatten_meal_picks_totals_and_fills_missing_nutrients():
+    row = flatten_meal(MEAL)
+
+    assert row["meal_id"] == str(MEAL_ID)
+    assert row["timestamp"] == "2024-05-01T12:30:00+00:00"
+    assert row["items_count"] == 2
+    assert (row["calories"], row["protein"], row["fat"]) == (540.5, 20, 0)
+    assert tuple(row) == EXPORT_COLUMNS
+
+
+def test_flatten_meal_tolerates_missing_analysis_and_timestamp():
+    row = flatten_meal({"_id": MEAL_ID})
+    assert row["timestamp"] is None and row["items_count"] is None
+    assert row["calories"] == 0
+
+
+def test_ndjson_export_is_one_object_per_line():
+    lines = _export([MEAL, MEAL], "ndjson").decode().splitlines()
+    assert [json.loads(line)["meal_id"] for line in lines] == [str(MEAL_ID)] * 2
+
+
+def test_gzipped_csv_export_round_trips():
+    body = gzip.decompress(_export([MEAL], "csv", compress=True)).decode()
+    rows = list(csv.DictReader(io.StringIO(body)))
+
+    assert len(rows) == 1
+    assert rows[0]["meal_id"] == str(MEAL_ID)
+    assert rows[0]["calories"] == "540.5"
+
+
+def test_empty_csv_export_still_has_a_header():
+    assert _export([], "csv").decode().strip() == ",".join(EXPORT_COLUMNS)
@@ -0,0 +1,41 @@
+from types import SimpleNamespace
+
+from app.services.gemini import CircuitBreaker, GeminiClient
+from app.models.schemas import MealIdentification
+
+
+class StreamingModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate_content(self, **kwargs):
+        assert kwargs["stream"] is True
+        return iter(SimpleNamespace(parts=[text], text=text) for text in self.chunks)
+
+
+def _half_open_client(chunks) -> GeminiClient:
+    client = GeminiClient("test-model")
+    client._model = StreamingModel(chunks)
+    client._breaker = CircuitBreaker(threshold=1, cooldown=0)
+    client._breaker.record_failure()
+    assert client._breaker.state == "half_open"
+    return client
+
+
+def test_stream_json_releases_trial_when_consumer_disconnects():
+    client = _half_open_client(['{"items": [', "]}"])
+
+    stream = client.stream_json([], MealIdentification)
+    assert next(stream) == '{"items": ['
+    stream.close()  # GeneratorExit, as on a client disconnect
+
+    assert client._breaker.allow()
+
+
+def test_stream_json_success_closes_breaker():
+    client = _half_open_client(['{"items": [', "]}"])
+
+    chunks = list(client.stream_json([], MealIdentification))
+
+    assert chunks[-1] == '{"items": []}'
+    assert client._breaker.state == "closed"
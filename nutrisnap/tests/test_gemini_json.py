@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from app.services.gemini import _parse_json, _repair_json
+
+
+def test_valid_json_parses_directly():
+    assert _parse_json('{"items": []}') == {"items": []}
+
+
+def test_markdown_fences_and_prose_are_stripped():
+    text = 'Here you go:\n```json\n{"items": [{"name": "dal"}]}\n```\nEnjoy!'
+    assert _parse_json(text) == {"items": [{"name": "dal"}]}
+
+
+def test_trailing_commas_are_dropped():
+    assert _parse_json('{"items": [{"name": "rice",},],}') == {"items": [{"name": "rice"}]}
+
+
+def test_braces_inside_strings_are_ignored():
+    assert _parse_json('{"name": "curry {spicy]", "n": 1} trailing') == {
+        "name": "curry {spicy]",
+        "n": 1,
+    }
+
+
+def test_truncated_output_is_closed_after_last_complete_value():
+    text = '{"items": [{"name": "idli", "weight": 50}, {"name": "samb'
+    repaired = json.loads(_repair_json(text))
+    assert repaired == {"items": [{"name": "idli", "weight": 50}]}
+
+
+@pytest.mark.parametrize("text", ["no json here", '{"items": [', '{"a": [1}'])
+def test_unrepairable_output_raises_value_error(text):
+    with pytest.raises(ValueError):
+        _parse_json(text)
+
+
+def test_cache_key_changes_with_prompt_schema_or_kb_version(monkeypatch):
+    from app.services import gemini
+
+    before = gemini._cache_key(b"image", "Thai")
+    monkeypatch.setattr(gemini, "_CACHE_VERSION", "next")
+
+    assert gemini._cache_key(b"image", "Thai") != before
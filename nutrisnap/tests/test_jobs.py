@@ -0,0 +1,123 @@
+import time
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+
+from app.services import jobs
+from app.core.config import JOB_MAX_ATTEMPTS
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    collection = mongomock.MongoClient().db.analysis_jobs
+    monkeypatch.setattr(jobs, "jobs_collection", collection)
+    return collection
+
+
+def _expire_lease(queue, job_id):
+    queue.update_one(
+        {"_id": job_id},
+        {"$set": {"lease_until": datetime.utcnow() - timedelta(seconds=1)}},
+    )
+
+
+def test_claim_takes_oldest_queued_job(queue):
+    first = jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+    jobs.enqueue_job(b"b", None, "u1", "a@x.com")
+
+    job = jobs.claim_job("w1")
+
+    assert str(job["_id"]) == first
+    assert job["status"] == jobs.RUNNING
+    assert job["worker"] == "w1"
+    assert job["attempts"] == 1
+
+
+def test_leased_job_is_not_claimed_twice(queue):
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+
+    assert jobs.claim_job("w1") is not None
+    assert jobs.claim_job("w2") is None
+
+
+def test_expired_lease_is_reclaimed_and_old_worker_loses_it(queue):
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+    job = jobs.claim_job("w1")
+    _expire_lease(queue, job["_id"])
+
+    reclaimed = jobs.claim_job("w2")
+
+    assert reclaimed["_id"] == job["_id"]
+    assert reclaimed["attempts"] == 2
+    # The slow first worker can no longer renew, complete or fail it
+    assert not jobs.renew_lease(job["_id"], "w1")
+    assert not jobs.complete_job(job["_id"], "w1", {"meal_id": "x"})
+    assert not jobs.fail_job(job["_id"], "w1", "boom", job["attempts"])
+    assert jobs.complete_job(job["_id"], "w2", {"meal_id": "x"})
+    assert queue.find_one({"_id": job["_id"]})["status"] == jobs.DONE
+
+
+def test_fail_job_requeues_until_attempts_run_out(queue):
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+
+    for attempt in range(1, JOB_MAX_ATTEMPTS + 1):
+        job = jobs.claim_job("w1")
+        assert job["attempts"] == attempt
+        assert jobs.fail_job(job["_id"], "w1", "boom", job["attempts"])
+
+    doc = queue.find_one({"_id": job["_id"]})
+    assert doc["status"] == jobs.FAILED
+    assert "image" not in doc
+    assert jobs.claim_job("w1") is None
+
+
+def test_crash_on_last_attempt_marks_job_failed(queue):
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+    for _ in range(JOB_MAX_ATTEMPTS - 1):
+        job = jobs.claim_job("w1")
+        jobs.fail_job(job["_id"], "w1", "boom", job["attempts"])
+
+    job = jobs.claim_job("w1")  # last attempt; the worker then dies
+    _expire_lease(queue, job["_id"])
+
+    assert jobs.claim_job("w2") is None
+    doc = queue.find_one({"_id": job["_id"]})
+    assert doc["status"] == jobs.FAILED
+    assert "lease" in doc["error"]
+
+
+def test_heartbeat_keeps_a_long_job_leased(queue):
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+    job = jobs.claim_job("w1")
+
+    with jobs.lease_heartbeat(job["_id"], "w1", interval=0.01) as lost:
+        _expire_lease(queue, job["_id"])
+        time.sleep(0.1)  # the heartbeat renews before anyone can reclaim
+
+    assert not lost.is_set()
+    assert jobs.claim_job("w2") is None
+
+
+def test_heartbeat_flags_a_lost_lease(queue):
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+    job = jobs.claim_job("w1")
+    _expire_lease(queue, job["_id"])
+    assert jobs.claim_job("w2") is not None
+
+    with jobs.lease_heartbeat(job["_id"], "w1", interval=0.01) as lost:
+        assert lost.wait(1)
+
+
+def test_failed_job_error_is_generic(queue, monkeypatch):
+    from app import worker
+    from app.services import meals
+
+    def boom(*args, **kwargs):
+        raise RuntimeError("mongodb://admin:secret@db internal detail")
+
+    monkeypatch.setattr(meals, "analyze_meal", boom)
+    jobs.enqueue_job(b"a", None, "u1", "a@x.com")
+    worker.run_job(jobs.claim_job("w1"), "w1")
+
+    assert queue.find_one()["error"] == "Analysis failed"
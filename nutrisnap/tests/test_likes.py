@@ -0,0 +1,24 @@
+import mongomock
+import pytest
+from bson import ObjectId
+
+from app.db import community
+
+
+@pytest.fixture
+def db(monkeypatch):
+    database = mongomock.MongoClient().db
+    monkeypatch.setattr(community, "likes_collection", database.community_likes)
+    return database
+
+
+def test_dedupe_keeps_one_like_per_user_and_post(db):
+    post_id = str(ObjectId())
+    db.community_likes.insert_many(
+        [{"post_id": post_id, "user_id": "u1"} for _ in range(3)]
+        + [{"post_id": post_id, "user_id": "u2"}]
+    )
+
+    assert community.dedupe_likes() == 2
+    assert sorted(l["user_id"] for l in db.community_likes.find()) == ["u1", "u2"]
+
@@ -0,0 +1,60 @@
+import pytest
+
+from app.services.nutrition_kb import build_analysis, nutrition_kb
+
+
+def _name(query):
+    row = nutrition_kb.match(query)
+    return None if row is None else nutrition_kb.names[row]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Fried Eggs", "fried egg"),
+    ("rice", "white rice"),
+    ("Basmati rice!", "white rice"),
+    ("chicken biriyani", "chicken biryani"),
+    ("butter chiken", "butter chicken"),
+])
+def test_exact_alias_and_misspelled_names_match(query, expected):
+    assert _name(query) == expected
+
+
+@pytest.mark.parametrize("query", [
+    "egg fried rice",
+    "grilled chicken salad",
+    "brown rice bowl",
+    "egg curry",
+    "mutton biryani",
+    "",
+])
+def test_different_dishes_do_not_borrow_macros(query):
+    assert _name(query) is None
+
+
+def test_build_analysis_uses_kb_per_gram_and_sums_totals():
+    analysis = build_analysis({"items": [
+        {"name": "white rice", "confidence": 0.9, "estimated_weight_g": 200},
+        {
+            "name": "egg fried rice",
+            "confidence": 0.8,
+            "estimated_weight_g": 150,
+            "nutrition_per_portion": {"calories": 250.0},
+        },
+    ]})
+
+    rice, fried = analysis["items"]
+    assert rice["source"] == "kb" and rice["nutrition_per_portion"]["calories"] == 260.0
+    assert fried["source"] == "model"
+    assert analysis["total_nutrition"]["calories"] == 510.0
+
+
+def test_version_follows_table_contents(tmp_path):
+    from app.services.nutrition_kb import NutritionKB
+
+    header = "name,aliases,calories,protein,carbs,fat,fiber,sugar,sodium\n"
+    path = tmp_path / "kb.csv"
+    path.write_text(header + "toast,,265,9,49,3.2,2.7,5,490\n")
+    first = NutritionKB(path).version
+    path.write_text(header + "toast,,280,9,49,3.2,2.7,5,490\n")
+
+    assert NutritionKB(path).version != first
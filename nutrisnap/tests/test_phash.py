@@ -0,0 +1,61 @@
+import time
+
+from app.services.phash import PHashIndex
+
+
+def _index():
+    index = PHashIndex()
+    # Keep lookups off the background Mongo refresh
+    index._last_refresh = time.monotonic()
+    return index
+
+
+def test_lookup_is_scoped_to_user():
+    index = _index()
+    index.add(0b1011, "meal-1", "u1", None)
+
+    assert index.lookup(0b1011, "u1", None) == "meal-1"
+    assert index.lookup(0b1011, "u2", None) is None
+
+
+def test_lookup_is_scoped_to_cuisine_hint():
+    index = _index()
+    index.add(0b1011, "meal-1", "u1", "Indian")
+
+    assert index.lookup(0b1010, "u1", " indian ") == "meal-1"
+    assert index.lookup(0b1011, "u1", "Thai") is None
+    assert index.lookup(0b1011, "u1", None) is None
+    assert index.size == 1
+
+
+def test_lookup_skips_removed_meals():
+    index = _index()
+    index.add(0b1011, "meal-1", "u1", None)
+    index.add(0b1001, "meal-2", "u1", None)
+
+    index.remove("meal-1")
+
+    assert index.lookup(0b1011, "u1", None) == "meal-2"
+    index.remove("meal-2")
+    assert index.lookup(0b1011, "u1", None) is None
+
+
+def test_refresh_picks_up_meals_by_indexed_at(monkeypatch):
+    import mongomock
+    from datetime import datetime
+    from bson import ObjectId
+    from app.services import phash
+
+    meals = mongomock.MongoClient().db.meals
+    monkeypatch.setattr(phash, "meals_collection", meals)
+    index = PHashIndex()
+
+    newer, older = ObjectId(), ObjectId()
+    meals.insert_one({"_id": newer, "user_id": "u1", "phash": "b", "indexed_at": datetime.utcnow()})
+    index._refresh()
+    # A worker stores a meal whose _id predates the last one seen
+    meals.insert_one({"_id": older, "user_id": "u1", "phash": "f0", "indexed_at": datetime.utcnow()})
+    index._refresh()
+
+    assert index.lookup(0xF0, "u1", None, max_distance=0) == older
+    assert index.size == 2
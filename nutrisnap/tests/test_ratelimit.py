@@ -0,0 +1,71 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import ratelimit
+from app.core.ratelimit import ClientIP, TokenBucketLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now.value)
+    return now
+
+
+def test_burst_then_reject_with_retry_after(clock):
+    limiter = TokenBucketLimiter(burst=3, per_minute=60)
+
+    assert [limiter.acquire("k") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.acquire("k") == pytest.approx(1.0)
+
+
+def test_tokens_refill_over_time(clock):
+    limiter = TokenBucketLimiter(burst=2, per_minute=60)
+    limiter.acquire("k")
+    limiter.acquire("k")
+
+    clock.value += 1.0
+    assert limiter.acquire("k") == 0.0
+    assert limiter.acquire("k") > 0
+
+
+def test_keys_are_independent(clock):
+    limiter = TokenBucketLimiter(burst=1, per_minute=1)
+    assert limiter.acquire("a") == 0.0
+    assert limiter.acquire("a") > 0
+    assert limiter.acquire("b") == 0.0
+
+
+def test_check_does_not_consume(clock):
+    limiter = TokenBucketLimiter(burst=1, per_minute=60)
+    assert limiter.check("k") == 0.0
+    assert limiter.check("k") == 0.0
+    limiter.acquire("k")
+    assert limiter.check("k") == pytest.approx(1.0)
+
+
+def _request(peer, forwarded=None):
+    headers = {"x-forwarded-for": forwarded} if forwarded else {}
+    return SimpleNamespace(client=SimpleNamespace(host=peer), headers=headers)
+
+
+def test_client_ip_ignores_forwarded_header_from_untrusted_peer():
+    resolve = ClientIP([])
+    assert resolve(_request("203.0.113.9", "1.2.3.4")) == "203.0.113.9"
+
+
+def test_client_ip_uses_rightmost_untrusted_hop_behind_proxy():
+    resolve = ClientIP(["10.0.0.0/8"])
+    # Left-most entry is spoofable; 198.51.100.7 is what our proxy saw
+    request = _request("10.0.0.2", "6.6.6.6, 198.51.100.7, 10.0.0.3")
+    assert resolve(request) == "198.51.100.7"
+
+
+def test_forwarded_request_from_untrusted_peer_is_flagged_as_shared():
+    resolve = ClientIP([])
+    assert resolve.behind_unknown_proxy(_request("10.0.0.2", "198.51.100.7"))
+    assert not resolve.behind_unknown_proxy(_request("198.51.100.7"))
+    assert not ClientIP(["10.0.0.0/8"]).behind_unknown_proxy(
+        _request("10.0.0.2", "198.51.100.7")
+    )
@@ -0,0 +1,35 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.utils.uploads import RequestSizeLimit
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(RequestSizeLimit, max_bytes=10, path_limits={"/big": 100})
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    @app.post("/big")
+    async def big(request: Request):
+        return {"size": len(await request.body())}
+
+    return TestClient(app)
+
+
+def test_content_length_over_limit_is_rejected():
+    assert _client().post("/echo", content=b"x" * 11).status_code == 413
+
+
+def test_chunked_body_is_counted():
+    chunks = iter([b"x" * 6, b"x" * 6])
+    response = _client().post("/echo", content=chunks)
+    assert response.status_code == 413
+
+
+def test_small_and_per_path_bodies_pass():
+    client = _client()
+    assert client.post("/echo", content=b"x" * 10).json() == {"size": 10}
+    assert client.post("/big", content=b"x" * 50).json() == {"size": 50}
@@ -0,0 +1,14 @@
+from app.models.schemas import legacy_nutrition
+
+
+def test_legacy_nutrition_uses_unit_suffixed_keys():
+    assert legacy_nutrition({"calories": 500, "protein": 20, "sodium_mg": 300}) == {
+        "calories": 500,
+        "protein_g": 20,
+        "carbs_g": 0,
+        "fat_g": 0,
+        "fiber_g": 0,
+        "sugar_g": 0,
+        "sodium_mg": 300,
+    }
+